@@ -1,29 +1,41 @@
 import streamlit as st
-import duckdb
-from openai import OpenAI
-import google.genai as genai
-from google.genai import types
-import openai  # Ou use google.generativeai para Gemini
-import pandas as pd
-import plotly.express as px
-import folium
-import altair as alt
-from streamlit_folium import folium_static
-import requests
+import csv
 import json
+import math
 import os
+import time
 from dotenv import load_dotenv
+from malha import DIRETORIO_MALHA, MalhaMunicipal, escolher_zoom
+from mapa import CamadasMapa
+from banco import CAMINHO_BANCO, LIMITE_LINHAS, banco_atual, impressao_banco
+from cache_sql import CacheSQL
+from cache_resultados import CacheResultados
+from cubo import CuboRecortes
+from guarda_sql import ConsultaRejeitada, GuardaSQL
+from instrumentacao import RegistroSpans
+from planejador import Catalogo, Planejador
+from pipeline import AnaliseEmSegundoPlano
+
+# O Streamlit executa este arquivo a cada interação. SDKs das LLMs, pandas,
+# Plotly e Folium são importados dentro das funções que os usam, apenas na
+# primeira consulta, gráfico ou mapa; o Python os mantém carregados depois disso.
 
 #######################
 # Carregar credenciais
 # Load the environment variables
 load_dotenv()
 
-# Access the environment variable
-openai.api_key = os.environ.get('OPENAI_API_KEY')
-GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
-# Configuração do cliente Gemini
-client = genai.Client(api_key=GEMINI_API_KEY)
+# Clientes das LLMs, criados uma única vez por processo e compartilhados entre
+# as sessões; cada um mantém seu pool de conexões HTTP entre as chamadas
+@st.cache_resource
+def get_cliente_openai():
+    import openai
+    return openai.OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
+
+@st.cache_resource
+def get_cliente_gemini():
+    from google import genai
+    return genai.Client(api_key=os.environ.get('GEMINI_API_KEY'))
 
 #######################
 # Page configuration
@@ -33,17 +45,103 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded")
 
-alt.themes.enable("default")
+#######################
+# Registro da latência por etapa, consultado na página de administração
+@st.cache_resource
+def get_registro_spans():
+    return RegistroSpans()
+
+registro_spans = get_registro_spans()
 
 #######################
-# Carregar dados do IBGE
-@st.cache_data
+# Carregar malha municipal do IBGE (gerada localmente com `python malha.py`)
+@st.cache_resource
 def get_br_municipio():
-    url = "https://servicodados.ibge.gov.br/api/v3/malhas/paises/BR?formato=application/vnd.geo+json&qualidade=maxima&intrarregiao=municipio"
-    return requests.get(url).json()
+    with registro_spans.span("get_br_municipio") as span:
+        malha = MalhaMunicipal(DIRETORIO_MALHA)
+        # Lê o índice agora, para que a carga entre no span
+        span["ufs"] = len(malha.indice["ufs"])
+    return malha
+
+# Camadas do mapa por UF, quantizadas e mantidas em cache; carregadas no primeiro mapa
+@st.cache_resource
+def _carregar_camadas_mapa():
+    return CamadasMapa(get_br_municipio())
+
+def get_camadas_mapa():
+    """Camadas do mapa, ou None se a malha ainda não foi gerada.
+
+    A ausência não fica em cache: a malha gerada depois passa a ser usada sem reiniciar.
+    """
+    if not MalhaMunicipal.disponivel(DIRETORIO_MALHA):
+        return None
+    return _carregar_camadas_mapa()
+
+# Catálogo de indicadores da PNDR exibido ao lado da consulta, lido uma única vez
+CAMINHO_CATALOGO = "data/indicadores_pndr.csv"
 
-# Uso da função
-geojson_data = get_br_municipio()
+@st.cache_data
+def get_tabela_indicadores():
+    with open(CAMINHO_CATALOGO, encoding="utf-8", newline="") as arquivo:
+        cabecalho, *linhas = list(csv.reader(arquivo))
+    return "\n".join(
+        ["| " + " | ".join(cabecalho) + " |", "|" + "---|" * len(cabecalho)]
+        + ["| " + " | ".join(linha) + " |" for linha in linhas]
+    )
+
+# Linhas por página na tabela e barras no gráfico
+TAMANHO_PAGINA = 1000
+MAX_BARRAS = 50
+
+#######################
+# Conexão com o DuckDB, aberta uma única vez e compartilhada entre as sessões
+# e a página de administração. É reaberta se o arquivo do banco for substituído.
+def get_banco():
+    return banco_atual(CAMINHO_BANCO)
+
+# Cache de tabelas e análises por SQL, invalidado quando o banco muda
+@st.cache_resource
+def get_cache_resultados():
+    return CacheResultados()
+
+# Recortes geográficos por município, usados no resumo enviado à análise por IA
+@st.cache_data(max_entries=1)
+def _carregar_recortes(impressao):
+    from resumo import COLUNAS_RECORTE
+    colunas = ", ".join(f'"{coluna}"' for coluna in COLUNAS_RECORTE)
+    return get_banco().executar(
+        f"SELECT codigo_ibge, {colunas} FROM recortes_geograficos"
+    ).fetchdf().set_index("codigo_ibge")
+
+def get_recortes():
+    return _carregar_recortes(impressao_banco(CAMINHO_BANCO))
+
+# Planejador local para perguntas estruturadas, montado a partir do catálogo do banco
+@st.cache_resource(max_entries=1)
+def _abrir_planejador(impressao):
+    return Planejador(Catalogo.do_banco(get_banco()))
+
+def get_planejador():
+    return _abrir_planejador(impressao_banco(CAMINHO_BANCO))
+
+# Cubo de agregados por recorte (`python cubo.py`), se já tiver sido gerado no banco
+@st.cache_resource(max_entries=1)
+def _abrir_cubo(impressao):
+    banco = get_banco()
+    return CuboRecortes(banco) if CuboRecortes.disponivel(banco) else None
+
+def get_cubo():
+    return _abrir_cubo(impressao_banco(CAMINHO_BANCO))
+
+# Cache pergunta -> SQL, persistido em disco
+@st.cache_resource
+def get_cache_sql():
+    return CacheSQL()
+
+# Verificação do SQL antes da execução (comandos permitidos, custo, LIMIT e tempo limite)
+@st.cache_resource
+def get_guarda_sql():
+    return GuardaSQL()
 
 #######################
 # Funções auxiliares
@@ -55,12 +153,24 @@ def query_llm(question):
     Tabelas e suas colunas:
 
     recortes_geograficos(codigo_ibge BIGINT, município VARCHAR, estado VARCHAR, região VARCHAR, faixa_de_fronteira INTEGER, participacao_semiarido VARCHAR, regiao_intermediaria VARCHAR, tipologia VARCHAR, participacao_sudene VARCHAR, regiao_imediata VARCHAR, participacao_amazonia_legal VARCHAR, longitude DOUBLE, latitude DOUBLE, geometry VARCHAR)
-    valoresmeta(mdata_id BIGINT, geoloc_id BIGINT, local_id BIGINT, refdate TIMESTAMP, value DOUBLE, orig_name VARCHAR, data_name VARCHAR, local_name VARCHAR) 
+    valoresmeta(mdata_id BIGINT, geoloc_id BIGINT, local_id BIGINT, refdate TIMESTAMP, value DOUBLE, orig_name VARCHAR, data_name VARCHAR, local_name VARCHAR, ano INTEGER, indicador_id INTEGER) 
+    valoresmeta_latest(mesmas colunas de valoresmeta, apenas com o valor mais recente de cada indicador em cada município)
+    indicadores(indicador_id INTEGER, data_name VARCHAR)
 
     Relações entre as tabelas (Chaves Estrangeiras):
 
     recortes_geograficos.codigo_ibge -> valoresmeta.geoloc_id
+    recortes_geograficos.codigo_ibge -> valoresmeta_latest.geoloc_id
+    indicadores.indicador_id -> valoresmeta.indicador_id
     """
+    regras_cubo = ""
+    if get_cubo() is not None:
+        schema_info += """
+    cubo_recortes(data_name VARCHAR, ano INTEGER, recorte VARCHAR, valor VARCHAR, n BIGINT, media DOUBLE, mediana DOUBLE, p10 DOUBLE, p25 DOUBLE, p75 DOUBLE, p90 DOUBLE, minimo DOUBLE, maximo DOUBLE, media_ponderada DOUBLE, populacao DOUBLE)
+    (agregados pré-calculados por indicador, ano e recorte; `recorte` é 'brasil', 'estado', 'região', 'tipologia', 'participacao_semiarido', 'participacao_sudene', 'participacao_amazonia_legal' ou 'faixa_de_fronteira', e `valor` é o valor do recorte, por exemplo 'Nordeste' ou 'Sim')
+    """
+        regras_cubo = """
+    - Para médias, medianas ou comparações entre estados, regiões, tipologias, semiárido, Sudene, Amazônia Legal, faixa de fronteira ou o Brasil, consulte a tabela cubo_recortes em vez de agregar valoresmeta, filtrando por `recorte`, `data_name LIKE '%...%'` e `ano`, e devolvendo a média como `media AS value`."""
 
     prompt = f"""
     Você é um assistente SQL especializado em consultas para DuckDB. 
@@ -73,17 +183,19 @@ def query_llm(question):
     - **Retorne uma query SQL válida para DuckDB.**
     - Utilize apenas tabelas e colunas existentes, de preferência as tabelas recortes_geograficos e valoresmeta.
     - A tabela recortes_geograficos contém informações sobre municípios e seus recortes territoriais, como semiárido, Região Intermediária, Tipologia da PNDR, Sudene, Região Imediata, Amazônia Legal, Estados/UF ou Região.
-    - A tabela valoresmeta contém informações sobre os indicadores, incluindo o valor (value) e a data de referência (refdate).
+    - A tabela valoresmeta contém informações sobre os indicadores, incluindo o valor (value), a data de referência (refdate) e o ano de referência (ano).
+    - A tabela indicadores contém o nome de cada indicador (data_name); filtre o indicador por ela, usando `v.indicador_id IN (SELECT indicador_id FROM indicadores WHERE data_name LIKE '%...%')`.
+    - Para filtrar por ano, utilize sempre a coluna inteira `ano` (por exemplo, `v.ano = 2021`), nunca funções sobre `refdate`.
     - Utilize sempre LEFT JOIN entre as tabelas recortes_geograficos e valoresmeta, unindo-as pela coluna `codigo_ibge` e `geoloc_id` respectivamente.
     - Ao filtrar por algum recorte geográfico ou indicador, utilize sempre a busca aproximada (LIKE) para garantir que o usuário receba resultados relevantes, a não ser que o usuário peça pelo termo exato.
     - Se o usuário solicitar por um município específico, retorne os dados desse município.
     - Se o usuário solicitar por um recorte geográfico ou administrativo, retorne a lista de municípios deste recorte.
     - Se o usuário solicitar por um indicador e não especificar o recorte geográfico, retorne os valores do indicador para todos os municípios.
-    - Se o usuário não solicitar uma data específica, retorne os dados mais recentes disponíveis.
+    - Se o usuário não solicitar uma data específica, retorne os dados mais recentes disponíveis, consultando a tabela valoresmeta_latest no lugar de valoresmeta.
     - Se o usuário solicitar uma data específica, retorne os dados apenas para o ano dessa data.
     - Se o usuário solicitar por um município, procure na coluna `município` da tabela recortes_geograficos.
     - Os Estado estão descrito pelo nome por extenso na coluna `estado`.
-    - Os municípios estão descritos pelo nome por extenso na coluna `municipio`.
+    - Os municípios estão descritos pelo nome por extenso na coluna `municipio`.{regras_cubo}
 
     📌 **Exemplos de queries válidas:**
     🔹 **Retornar a lista de todos os municípios com código IBGE e todos os recortes geográficos e administrativos**
@@ -95,15 +207,15 @@ def query_llm(question):
         r.município,
         r.estado,
         v.value,
-        strftime('%Y', v.refdate) AS ano,
+        v.ano,
         v.data_name,
     FROM
         valoresmeta AS v
     LEFT JOIN
         recortes_geograficos AS r ON r.codigo_ibge = v.geoloc_id
     WHERE
-        v.data_name LIKE '%Diferencial Salarial Médio Feminino%'
-        AND strftime('%Y', v.refdate) = '2021';
+        v.indicador_id IN (SELECT indicador_id FROM indicadores WHERE data_name LIKE '%Diferencial Salarial Médio Feminino%')
+        AND v.ano = 2021;
 
         🔹 **Retornar a lista dos municípios com o indicador de Desmatamento da região imediata de Toledo para 2020**
     SELECT
@@ -112,7 +224,7 @@ def query_llm(question):
         r.estado,
         r.regiao_imediata,
         v.value,
-        strftime('%Y', v.refdate) AS ano,
+        v.ano,
         v.data_name,
     FROM
         valoresmeta AS v
@@ -120,8 +232,8 @@ def query_llm(question):
         recortes_geograficos AS r ON r.codigo_ibge = v.geoloc_id
     WHERE
         r.regiao_imediata LIKE '%Toledo%'
-        AND v.data_name LIKE '%Desmatamento%'
-        AND strftime('%Y', v.refdate) = '2020';
+        AND v.indicador_id IN (SELECT indicador_id FROM indicadores WHERE data_name LIKE '%Desmatamento%')
+        AND v.ano = 2020;
 
         🔹 **Retornar a lista dos municípios com o indicador de Desmatamento da região imediata de Toledo**
     SELECT
@@ -130,24 +242,15 @@ def query_llm(question):
     r.estado,
     r.regiao_imediata,
     v.value,
-    strftime('%Y', v.refdate) AS ano,
+    v.ano,
     v.data_name
 FROM
-    valoresmeta AS v
+    valoresmeta_latest AS v
 LEFT JOIN
     recortes_geograficos AS r ON r.codigo_ibge = v.geoloc_id
 WHERE
     r.regiao_imediata LIKE '%Toledo%'
-    AND v.data_name LIKE '%Desmatamento%'
-    AND v.refdate = (
-        SELECT
-            MAX(refdate)
-        FROM
-            valoresmeta
-        WHERE
-            geoloc_id = v.geoloc_id
-            AND data_name = v.data_name
-    );
+    AND v.indicador_id IN (SELECT indicador_id FROM indicadores WHERE data_name LIKE '%Desmatamento%');
 
         🔹 **crie uma lista do indicador Taxa de Variação Populacional para o estado de sergipe**
     SELECT
@@ -155,24 +258,15 @@ WHERE
     r.município,
     r.estado,
     v.value,
-    strftime('%Y', v.refdate) AS ano,
+    v.ano,
     v.data_name
 FROM
-    valoresmeta AS v
+    valoresmeta_latest AS v
 LEFT JOIN
     recortes_geograficos AS r ON r.codigo_ibge = v.geoloc_id
 WHERE
     r.estado LIKE '%Sergipe%'
-    AND v.data_name LIKE '%Taxa de Variação Populacional%'
-    AND v.refdate = (
-        SELECT
-            MAX(refdate)
-        FROM
-            valoresmeta
-        WHERE
-            geoloc_id = v.geoloc_id
-            AND data_name = v.data_name
-    );
+    AND v.indicador_id IN (SELECT indicador_id FROM indicadores WHERE data_name LIKE '%Taxa de Variação Populacional%');
         
         🔹 **Criar um mapa do Paraná com o indicador de Sustentabilidade Fiscal dos Municípios para 2019**
     SELECT
@@ -180,7 +274,7 @@ WHERE
         r.município,
         r.estado,
         v.value,
-        strftime('%Y', v.refdate) AS ano,
+        v.ano,
         v.data_name,
         r.latitude,
         r.longitude
@@ -190,72 +284,217 @@ WHERE
         recortes_geograficos AS r ON r.codigo_ibge = v.geoloc_id
     WHERE
         r.estado LIKE '%Paraná%'
-        AND v.data_name LIKE '%Sustentabilidade Fiscal dos Municípios%'
-        AND strftime('%Y', v.refdate) = '2019';
+        AND v.indicador_id IN (SELECT indicador_id FROM indicadores WHERE data_name LIKE '%Sustentabilidade Fiscal dos Municípios%')
+        AND v.ano = 2019;
     
     📌 **Agora gere uma query SQL para responder a seguinte pergunta do usuário:**
     Pergunta: {question}
     **Retorne apenas a query SQL sem aspas, sem nenhum comentário ou explicação.**
     """
     
-    client = OpenAI()
-    completion = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "system", "content": prompt}]
-    )
-    return completion.choices[0].message.content.strip()
+    with registro_spans.span("query_llm", pergunta=question) as span:
+        completion = get_cliente_openai().chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{"role": "system", "content": prompt}]
+        )
+        sql = completion.choices[0].message.content.strip()
+        span["sql"] = sql
+        if completion.usage is not None:
+            span["tokens_entrada"] = completion.usage.prompt_tokens
+            span["tokens_saida"] = completion.usage.completion_tokens
+    return sql
+
+def gerar_sql(question):
+    """Resolve a pergunta localmente quando possível; chama a LLM apenas como último recurso.
+
+    O SQL devolvido já passou pela guarda; SQL recusado levanta `ConsultaRejeitada`.
+    """
+    guarda, banco, planejador = get_guarda_sql(), get_banco(), get_planejador()
+    sql, _ = planejador.planejar(question)
+    if sql is None:
+        cache = get_cache_sql()
+        # Perguntas parecidas só reaproveitam o SQL se citarem os mesmos indicadores e recortes
+        sql = cache.buscar(question, validar=banco.validar, entidades=planejador.entidades)
+        if sql is None:
+            inicio = time.perf_counter()
+            sql = query_llm(question)
+            latencia = time.perf_counter() - inicio
+            # SQL recusado pela guarda não entra no cache
+            preparado = guarda.preparar(banco, sql)
+            cache.gravar(question, sql, latencia)
+            return preparado
+    return guarda.preparar(banco, sql)
 
 def fetch_data(sql):
-    """Executa a query no banco de dados DuckDB."""
-    conn = duckdb.connect("data/dados_reduzido.db")
-    # Instalar e carregar a extensão espacial
-    df = conn.execute(sql).fetchdf()
-    conn.close()
-    return df
-
-def analyze_data(df):
-    """Envia os dados para a LLM para análise e insights."""
-    json_data = df.to_json(orient='records')
-    response = client.models.generate_content(
-    model="gemini-2.5-flash-preview-04-17",
-    config=types.GenerateContentConfig(
-        system_instruction="""Você é um especialista em desenvolvimento regional no Brasil, analise os seguintes dados e forneça insights relevantes sobre o aspecto do desenvolvimento regional que eles representam.
+    """Executa a query no banco de dados DuckDB, reaproveitando resultados já calculados.
+
+    O SQL deve vir de `gerar_sql`. O resultado é mantido como tabela Arrow,
+    limitado a `LIMITE_LINHAS` linhas; consultas que passam do tempo limite
+    levantam `ConsultaRejeitada`.
+    """
+    with registro_spans.span("fetch_data", sql=sql, origem="cache") as span:
+        cache = get_cache_resultados()
+        tabela = cache.obter_tabela(sql)
+        if tabela is None:
+            span["origem"] = "banco"
+            tabela = get_guarda_sql().executar(get_banco(), sql)
+            cache.guardar_tabela(sql, tabela)
+        span["linhas"], span["bytes"] = tabela.num_rows, tabela.nbytes
+    return tabela
+
+def analyze_data_stream(df, recortes=None, cubo=None, cliente=None):
+    """Envia os dados para a LLM e devolve a análise em trechos, à medida que são gerados.
+
+    Quando o fluxo é consumido fora da thread do script, o cliente Gemini deve
+    ser obtido antes, com `get_cliente_gemini()`, e passado em `cliente`.
+    """
+    from google.genai import types
+    from resumo import preparar_payload
+    if cliente is None:
+        cliente = get_cliente_gemini()
+    with registro_spans.span("analyze_data", linhas=len(df)) as span:
+        # Resultados grandes seguem como resumo estatístico, não como linhas;
+        # com o cubo, vão junto as médias nacionais e por recorte do indicador
+        payload = preparar_payload(df, recortes, cubo=cubo)
+        span["bytes"] = len(payload.encode("utf-8"))
+        response = cliente.models.generate_content_stream(
+        model="gemini-2.5-flash-preview-04-17",
+        config=types.GenerateContentConfig(
+            system_instruction="""Você é um especialista em desenvolvimento regional no Brasil, analise os seguintes dados e forneça insights relevantes sobre o aspecto do desenvolvimento regional que eles representam.
     Considere a importância dos dados, possíveis tendências, correlações e implicações para políticas públicas.
     Na sua análise considere o disposto no Relatório de Monitoramento da PNDR de 2023 disponível no link para entender quais são os objetivos de 1 a 4, o que são os indicadores compostos e as fómulas de cálculo dos indicadores: https://www.gov.br/mdr/pt-br/assuntos/desenvolvimento-regional/nucleo-de-inteligencia-regional/acompanhamento-dinamica/RelatorioMonitoramento20232.pdf"""),
-    contents=f"Analise os seguintes dados {json_data}"
-    )
-    return(response.text)
-
-def plot_data(df):
+        contents=payload
+        )
+        for chunk in response:
+            # O último trecho traz a contagem de tokens da resposta completa
+            if chunk.usage_metadata is not None:
+                span["tokens_entrada"] = chunk.usage_metadata.prompt_token_count
+                span["tokens_saida"] = chunk.usage_metadata.candidates_token_count
+            if chunk.text:
+                yield chunk.text
+
+def analyze_data(df, recortes=None, cubo=None, cliente=None):
+    """Envia os dados para a LLM para análise e insights."""
+    return "".join(analyze_data_stream(df, recortes, cubo, cliente))
+
+def show_table(tabela):
+    """Exibe a tabela paginada; apenas a página atual é enviada ao navegador."""
+    paginas = max(1, math.ceil(tabela.num_rows / TAMANHO_PAGINA))
+    pagina = 1
+    if paginas > 1:
+        pagina = st.number_input(f"Página (de {paginas}, {tabela.num_rows} linhas)",
+                                 min_value=1, max_value=paginas, value=1)
+    # slice é uma visão da tabela Arrow, sem cópia
+    st.dataframe(tabela.slice((pagina - 1) * TAMANHO_PAGINA, TAMANHO_PAGINA))
+
+def plot_data(tabela):
     """Cria gráficos com Plotly."""
-    if {'município', 'value'}.issubset(df.columns):
+    # Barras por município ou, nos resultados do cubo, por valor do recorte
+    eixo = next((c for c in ('município', 'valor') if c in tabela.column_names), None)
+    if eixo is not None and 'value' in tabela.column_names:
         st.write("### Visualização dos Dados")
-        fig = px.bar(df, x="município", y="value")  
-        st.plotly_chart(fig)
-
-def create_map(df, geojson_data):
+        with registro_spans.span("plot_data", linhas=tabela.num_rows) as span:
+            import plotly.express as px
+            import pyarrow.compute as pc
+            colunas = tabela.column_names
+            # Cada barra é uma série: o município (pelo código, pois há homônimos em UFs
+            # diferentes) ou o recorte, o indicador e o ano
+            chaves = [c for c in ('codigo_ibge', 'recorte', eixo, 'estado', 'data_name', 'ano')
+                      if c in colunas]
+            varios = {c: c in colunas and pc.count_distinct(tabela[c]).as_py() > 1
+                      for c in ('data_name', 'ano')}
+            # Rótulo da barra: o eixo, a UF (ou o código) e o ano quando o resultado tiver vários
+            uf = 'estado' if 'estado' in colunas else 'codigo_ibge'
+            partes = [f'"{c}"' for c in (eixo, uf) if c in colunas]
+            if varios['ano']:
+                partes.append('CAST(ano AS VARCHAR)')
+            rotulo = f"concat_ws(' · ', {', '.join(partes)})"
+            selecao = ", ".join(f'"{c}"' for c in chaves)
+            if tabela.num_rows > MAX_BARRAS:
+                # Mantém as séries separadas e desenha apenas os maiores valores
+                dados = get_banco().consultar_arrow(tabela, f"""
+                    SELECT {rotulo} AS rotulo, {selecao}, AVG(value) AS value
+                    FROM resultado
+                    GROUP BY {selecao}
+                    ORDER BY value DESC NULLS LAST
+                    LIMIT {MAX_BARRAS}""")
+                st.caption(f"Exibindo os {MAX_BARRAS} maiores valores.")
+            else:
+                dados = get_banco().consultar_arrow(tabela, f"""
+                    SELECT {rotulo} AS rotulo, {selecao}, value FROM resultado""")
+            span["barras"] = dados.num_rows
+            cor = 'data_name' if varios['data_name'] else None
+            fig = px.bar(dados.to_pandas(), x="rotulo", y="value", color=cor, barmode="group",
+                         labels={"rotulo": eixo})
+            st.plotly_chart(fig)
+
+def create_map(tabela, camadas=None):
     """Cria mapas com Folium se houver coordenadas."""
-    if {'latitude', 'longitude', 'value'}.issubset(df.columns):
+    if {'codigo_ibge', 'latitude', 'longitude', 'value'}.issubset(tabela.column_names):
         st.write("### Mapa do Indicador")
-        df = df.rename(columns={'codigo_ibge': 'codarea'})
-        m = folium.Map(location=[df['latitude'].mean(), df['longitude'].mean()], zoom_start=5)
-        folium.Choropleth(
-            geo_data=geojson_data, 
-            name="Indicador",
-            data=df,
-            columns=["codarea", "value"],
-            legend_name="Indicador",
-            key_on="feature.properties.codarea",
-            nan_fill_color="white",
-            nan_fill_opacity=0.4,
-            fill_color="YlGn",
-            fill_opacity=0.8,
-            line_weight=0.1,
-        ).add_to(m)
-        # Adiciona um layer control para alternar entre os mapas
-        folium.LayerControl().add_to(m)
-        folium_static(m)
+        with registro_spans.span("create_map", linhas=tabela.num_rows) as span:
+            import folium
+            import pyarrow as pa
+            import pyarrow.compute as pc
+            from streamlit_folium import folium_static
+            if camadas is None:
+                camadas = get_camadas_mapa()
+            if camadas is None:
+                st.warning("A malha municipal não foi encontrada em data/malha; o mapa não será exibido. "
+                           "Gere-a com `python malha.py`.")
+                return
+            # O código vira texto ainda no Arrow: no pandas, um único nulo (LEFT JOIN sem
+            # recorte) tornaria a coluna float e os códigos "4100103.0", sem casar com a malha
+            tabela = tabela.select(['codigo_ibge', 'latitude', 'longitude', 'value'])
+            tabela = tabela.filter(pc.is_valid(tabela['codigo_ibge']))
+            codigos = tabela['codigo_ibge']
+            if not pa.types.is_string(codigos.type):
+                codigos = pc.cast(pc.cast(codigos, pa.int64()), pa.string())
+            # Converte para pandas apenas as colunas usadas no mapa
+            df = tabela.set_column(0, 'codarea', codigos).to_pandas()
+            # Sem coordenadas ou valores (por exemplo, um ano sem dados) não há o que desenhar
+            df = df.dropna(subset=['latitude', 'longitude', 'value'])
+            if df.empty:
+                st.info("O resultado não tem municípios com coordenadas e valores para o mapa.")
+                return
+            zoom = escolher_zoom(df['latitude'], df['longitude'])
+            # Carrega apenas os municípios do resultado, no nível de detalhe do zoom
+            nivel = camadas.nivel_para_zoom(zoom)
+            geojson_data = camadas.geojson(df['codarea'], nivel)
+            span["nivel"], span["municipios"] = nivel, len(geojson_data["features"])
+            m = folium.Map(location=[df['latitude'].mean(), df['longitude'].mean()], zoom_start=zoom)
+            folium.Choropleth(
+                geo_data=geojson_data, 
+                name="Indicador",
+                data=df,
+                columns=["codarea", "value"],
+                legend_name="Indicador",
+                key_on="feature.properties.codarea",
+                nan_fill_color="white",
+                nan_fill_opacity=0.4,
+                fill_color="YlGn",
+                fill_opacity=0.8,
+                line_weight=0.1,
+            ).add_to(m)
+            # Adiciona um layer control para alternar entre os mapas
+            folium.LayerControl().add_to(m)
+            folium_static(m)
         
+def mostrar_analise(espaco, sql_query, insights, cache_resultados):
+    """Exibe a análise em cache ou a da thread em segundo plano, guardando-a ao final."""
+    with espaco:
+        if insights is not None:
+            st.write(insights)
+            return
+        try:
+            with st.spinner("Analisando dados..."):
+                insights = st.write_stream(st.session_state["analise"].trechos())
+            cache_resultados.guardar_analise(sql_query, insights)
+        except Exception as erro:
+            # Descarta a análise que falhou; o próximo rerun tenta de novo
+            st.session_state.pop("analise", None)
+            st.error(f"Não foi possível gerar a análise dos dados: {erro}")
+
 #######################
 # Streamlit App
 
@@ -275,64 +514,8 @@ with col[1]:
 
     st.write("**A tabela a seguir apresenta os indicadores utilizados na PNDR, divididos em objetivos e eixos. Cada indicador é descrito com seu respectivo nome e descrição.**")
     with st.container(height=300):
-        # Tabela em formato Markdown
-        tabela_markdown = """
-        | Objetivo/Eixo | Descrição do Objetivo/Eixo                                         | Indicador                                                                                                                      |
-        |---------------|--------------------------------------------------------------------|--------------------------------------------------------------------------------------------------------------------------------|
-        | Objetivo 1    | Convergência de renda                                              |  Diferencial entre Salário Médio no Mercado Formal e Mediana Nacional                                                          |
-        | Objetivo 1    | Convergência de renda                                              |  Diferencial entre Índice de Desenvolvimento da Educação Básica (Ideb) e Mediana Nacional                                      |
-        | Objetivo 1    | Convergência de renda                                              |  Diferencial entre Número de Profissionais de Saúde por Habitante e Mediana Nacional                                           |
-        | Objetivo 1    | Convergência de renda                                              | Indicador Composto do Objetivo 1                                                                                               |
-        | Objetivo 2    | Cidades Intermediadoras                                            |  Índice de Centralidade                                                                                                        |
-        | Objetivo 2    | Cidades Intermediadoras                                            |  Razão de Primazia Populacional Estadual                                                                                       |
-        | Objetivo 2    | Cidades Intermediadoras                                            |  Razão de Primazia Econômica Estadual                                                                                          |
-        | Objetivo 2    | Cidades Intermediadoras                                            | Indicador Composto do Objetivo 2                                                                                               |
-        | Objetivo 3    | Competitividade                                                    |  Percentual de vínculos formais com ensino superior                                                                            |
-        | Objetivo 3    | Competitividade                                                    |  Salário Médio no Mercado Formal                                                                                               |
-        | Objetivo 3    | Competitividade                                                    |  Taxa de Variação Populacional no Município                                                                                    |
-        | Objetivo 3    | Competitividade                                                    | Indicador Composto do Objetivo 3                                                                                               |
-        | Objetivo 4    | Diversificação                                                     |  Índice de Especialização do Emprego em Atividades Agrícolas                                                                   |
-        | Objetivo 4    | Diversificação                                                     |  Índice de Especialização do Emprego em Mineração                                                                              |
-        | Objetivo 4    | Diversificação                                                     |  Coeficiente de Diversificação Econômica                                                                                       |
-        | Objetivo 4    | Diversificação                                                     | Indicador Composto do Objetivo 4                                                                                               |
-        | Eixo 1        | Educação e capacitação professional                                |  Percentual de escolas com acesso a esgotamento sanitário                                                                      |
-        | Eixo 1        | Educação e capacitação professional                                |  Percentual de escolas com acesso à internet                                                                                   |
-        | Eixo 1        | Educação e capacitação professional                                |  Índice de matrículas em Educação Profissional e Tecnológica                                                                   |
-        | Eixo 1        | Educação e capacitação professional                                |  Índice de Desenvolvimento da Educação Básica (Ideb)                                                                           |
-        | Eixo 1        | Educação e capacitação professional                                |  Índice Composto de Educação e Capacitação Professional                                                                        |
-        | Eixo 2        | Ciência, tecnologia e inovação                                     |  Número de micro e pequenas empresas relacionadas ao setor de biotecnologia e saúde humana por milhão de habitantes            |
-        | Eixo 2        | Ciência, tecnologia e inovação                                     |  Número de empregos relacionados ao desenvolvimento científico e tecnológico por milhão de habitantes                          |
-        | Eixo 2        | Ciência, tecnologia e inovação                                     |  Número de empregos em estabelecimentos relacionadas ao desenvolvimento científico e tecnológico por milhão de habitantes      |
-        | Eixo 2        | Ciência, tecnologia e inovação                                     |  Número de depósitos de patentes por 100 mil habitantes                                                                        |
-        | Eixo 2        | Ciência, tecnologia e inovação                                     |  Índice Composto de Ciência, Tecnologia e Inovação                                                                             |
-        | Eixo 3        | Desenvolvimento produtivo                                          |  Índice de Complexidade Econômica                                                                                              |
-        | Eixo 3        | Desenvolvimento produtivo                                          |  Participação do setor industrial no emprego formal                                                                            |
-        | Eixo 3        | Desenvolvimento produtivo                                          |  Salário médio no mercado formal                                                                                               |
-        | Eixo 3        | Desenvolvimento produtivo                                          |  Escala produtiva                                                                                                              |
-        | Eixo 3        | Desenvolvimento produtivo                                          |  Índice Composto de Desenvolvimento Produtivo                                                                                  |
-        | Eixo 4        | Infraestrutura                                                     |  Índice de Atendimento Urbano de Água (IN023)                                                                                  |
-        | Eixo 4        | Infraestrutura                                                     |  Percentual de Acessos de Internet de Alta Velocidade no Município                                                             |
-        | Eixo 4        | Infraestrutura                                                     |  Número de Internações Hospitalares por Doenças Relacionadas ao Saneamento Ambiental Inadequado (DRSAI), por 10 mil habitantes |
-        | Eixo 4        | Infraestrutura                                                     |  Despesas nas áreas de habitação e recuperação de áreas degradadas per capita                                                  |
-        | Eixo 4        | Infraestrutura                                                     |  Índice Composto de Infraestrutura                                                                                             |
-        | Eixo 5        | Desenvolvimento social e acesso a serviços                         |  Desnutrição                                                                                                                   |
-        | Eixo 5        | Desenvolvimento social e acesso a serviços                         |  Percentual de Famílias de Baixa Renda no Cadastro Único                                                                       |
-        | Eixo 5        | Desenvolvimento social e acesso a serviços                         |  Distorção Idade-Série                                                                                                         |
-        | Eixo 5        | Desenvolvimento social e acesso a serviços                         |  Diferencial Salarial Médio Feminino no Mercado de Trabalho Formal                                                             |
-        | Eixo 5        | Desenvolvimento social e acesso a serviços                         |  Índice Composto de Desenvolvimento Social e Acesso a Serviços                                                                 |
-        | Eixo 6        | Sustentabilidade                                                   |  Número de Empregos em Estabelecimentos Relacionados a Reciclagem e Gestão de Resíduos                                         |
-        | Eixo 6        | Sustentabilidade                                                   |  Percentual de Área Desmatada no Município                                                                                     |
-        | Eixo 6        | Sustentabilidade                                                   |  Taxa de Desmatamento (km2/ano)                                                                                                |
-        | Eixo 6        | Sustentabilidade                                                   |  Emissões Líquidas de Gases de Efeito Estufa (CO2 Equivalente) da Agropecuária e Processos Industriais.                        |
-        | Eixo 6        | Sustentabilidade                                                   |  Índice Composto de Sustentabilidade                                                                                           |
-        | Eixo 7        | Fortalecimento das capacidades governativas dos entes subnacionais |  Percentual de dirigentes municipais com ensino superior completo na administração pública.                                    |
-        | Eixo 7        | Fortalecimento das capacidades governativas dos entes subnacionais |  Percentual de servidores municipais com ensino superior completo na administração pública                                     |
-        | Eixo 7        | Fortalecimento das capacidades governativas dos entes subnacionais |  Salário médio municipal de servidores da administração pública                                                                |
-        | Eixo 7        | Fortalecimento das capacidades governativas dos entes subnacionais |  Índice de Sustentabilidade Fiscal dos Municípios                                                                              |
-        | Eixo 7        | Fortalecimento das capacidades governativas dos entes subnacionais |  Índice Composto de Fortalecimento das Capacidades Governativas dos Entes Subnacionais                                         |
-        """
-        # Exibir a tabela no Streamlit
-        st.markdown(tabela_markdown, unsafe_allow_html=True)
+        # Tabela em formato Markdown, montada uma única vez a partir de data/indicadores_pndr.csv
+        st.markdown(get_tabela_indicadores(), unsafe_allow_html=True)
 
     st.markdown("**Os recortes geográficos e administrativos disponíveis para consulta são os seguintes:**")
     st.markdown("**1.** Municípios")
@@ -373,23 +556,58 @@ with col[0]:
         user_question = st.text_input("Digite o que você gostaria de consultar no Painel de Indicadores da PNDR:")
         
         if st.button("Consultar") and user_question:
-            with st.spinner("Gerando consulta..."):
-                sql_query = query_llm(user_question)
-                #st.code(sql_query, language='sql')
-            
-            with st.spinner("Buscando dados..."):
-                df = fetch_data(sql_query)
-                st.write("### Dados Filtrados")
-                st.dataframe(df)
-            
-            with st.spinner("Analisando dados..."):
-                insights = analyze_data(df)
-                st.write("### Insights gerados por IA")
-                st.write(insights)
-            
-            plot_data(df)
-            #create_map(df)
-            create_map(df, geojson_data)
+            st.session_state.pop("consulta", None)
+            st.session_state.pop("analise", None)
+            try:
+                with st.spinner("Gerando consulta..."):
+                    sql_query = gerar_sql(user_question)
+                    #st.code(sql_query, language='sql')
+                # Mantém a consulta entre reruns (por exemplo, ao trocar de página da tabela)
+                st.session_state["consulta"] = sql_query
+            except ConsultaRejeitada as erro:
+                st.error(f"A consulta gerada foi recusada: {erro}")
+            cache = get_cache_sql()
+            st.caption(f"Cache de consultas: {cache.taxa_acerto():.0%} de acerto, "
+                       f"{cache.estatisticas['tempo_economizado']:.1f} s de LLM economizados")
+
+        sql_query = st.session_state.get("consulta")
+        if sql_query:
+            try:
+                with st.spinner("Buscando dados..."):
+                    tabela = fetch_data(sql_query)
+            except ConsultaRejeitada as erro:
+                st.error(f"A consulta foi interrompida: {erro}")
+                st.session_state.pop("consulta", None)
+                return
+
+            # A análise roda em segundo plano enquanto tabela, gráfico e mapa são desenhados
+            cache_resultados = get_cache_resultados()
+            insights = cache_resultados.obter_analise(sql_query)
+            if insights is None and "analise" not in st.session_state:
+                recortes, cubo, cliente = get_recortes(), get_cubo(), get_cliente_gemini()
+                st.session_state["analise"] = AnaliseEmSegundoPlano(
+                    lambda: analyze_data_stream(tabela, recortes, cubo, cliente))
+
+            st.write("### Dados Filtrados")
+            if tabela.num_rows >= LIMITE_LINHAS:
+                st.warning(f"O resultado foi limitado a {LIMITE_LINHAS} linhas. Refine a consulta.")
+            show_table(tabela)
+
+            st.write("### Insights gerados por IA")
+            espaco_insights = st.container()
+
+            # A análise é exibida e guardada mesmo se o gráfico ou o mapa falharem
+            try:
+                plot_data(tabela)
+                #create_map(tabela)
+                create_map(tabela)
+            finally:
+                mostrar_analise(espaco_insights, sql_query, insights, cache_resultados)
+
+            st.caption(f"Cache de resultados: {cache_resultados.taxa_acerto():.0%} de acerto "
+                       f"({cache_resultados.estatisticas['memoria']} em memória, "
+                       f"{cache_resultados.estatisticas['disco']} em disco, "
+                       f"{cache_resultados.estatisticas['falhas']} falhas)")
 
     if __name__ == "__main__":
         main()
@@ -0,0 +1,174 @@
+"""Conexão compartilhada, somente leitura, com o banco DuckDB.
+
+O banco é aberto uma única vez por processo e cada thread (sessão do
+Streamlit) recebe o seu próprio cursor, preservando o cache de buffers e o
+catálogo entre as consultas. `banco_atual` reabre a conexão quando o arquivo
+é substituído.
+"""
+import os
+import threading
+
+import duckdb
+import pyarrow as pa
+
+CAMINHO_BANCO = "data/dados_reduzido.db"
+
+# Limites configuráveis por variáveis de ambiente
+THREADS = int(os.environ.get("PNDR_DUCKDB_THREADS", "4"))
+MEMORIA = os.environ.get("PNDR_DUCKDB_MEMORIA", "1GB")
+
+# Máximo de linhas trazidas do DuckDB por consulta
+LIMITE_LINHAS = int(os.environ.get("PNDR_LIMITE_LINHAS", "200000"))
+
+# Tabelas percorridas no aquecimento para carregar catálogo e buffers
+TABELAS_AQUECIMENTO = ("valoresmeta", "recortes_geograficos")
+
+
+def impressao_banco(caminho=CAMINHO_BANCO):
+    """Identifica a versão do arquivo do banco pela data de modificação e tamanho."""
+    info = os.stat(caminho)
+    return f"{info.st_mtime_ns:x}-{info.st_size:x}"
+
+
+class BancoDuckDB:
+    """Conexão única, somente leitura, com um cursor por thread."""
+
+    def __init__(self, caminho=CAMINHO_BANCO, threads=THREADS, memoria=MEMORIA):
+        self.caminho = caminho
+        self.conexao = duckdb.connect(
+            caminho,
+            read_only=True,
+            # Sem acesso externo, o SQL gerado não lê arquivos locais (read_text, read_csv)
+            config={"threads": threads, "memory_limit": memoria, "enable_external_access": False},
+        )
+        self._local = threading.local()
+        # Todos os cursores abertos, para que `fechar` libere a instância do DuckDB
+        self._cursores = []
+        self._trava = threading.Lock()
+
+    def novo_cursor(self):
+        """Cursor próprio sobre a conexão compartilhada, fechado junto com ela."""
+        cursor = self.conexao.cursor()
+        with self._trava:
+            self._cursores.append(cursor)
+        return cursor
+
+    def cursor(self):
+        """Cursor da thread atual, criado na primeira chamada."""
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            cursor = self.novo_cursor()
+            self._local.cursor = cursor
+        return cursor
+
+    def executar(self, sql, parametros=None):
+        """Executa a query no cursor da thread atual."""
+        return self.cursor().execute(sql, parametros)
+
+    def buscar_arrow(self, sql, limite=LIMITE_LINHAS, tempo_limite=None):
+        """Executa a query e devolve uma tabela Arrow com no máximo `limite` linhas.
+
+        O resultado é lido em lotes; a leitura para assim que o limite é atingido.
+        Com `tempo_limite` (segundos), a consulta é interrompida ao fim do prazo
+        e o DuckDB levanta `duckdb.InterruptException`.
+        """
+        cursor = self.cursor()
+        temporizador = None
+        if tempo_limite:
+            temporizador = threading.Timer(tempo_limite, cursor.interrupt)
+            temporizador.daemon = True
+            temporizador.start()
+        try:
+            leitor = cursor.execute(sql).fetch_record_batch(64 * 1024)
+            lotes, linhas = [], 0
+            for lote in leitor:
+                lotes.append(lote)
+                linhas += lote.num_rows
+                if linhas >= limite:
+                    break
+        finally:
+            if temporizador is not None:
+                temporizador.cancel()
+        return pa.Table.from_batches(lotes, schema=leitor.schema).slice(0, limite)
+
+    def consultar_arrow(self, tabela, sql):
+        """Executa SQL sobre uma tabela Arrow, registrada como `resultado`, sem copiá-la."""
+        cursor = self.cursor()
+        cursor.register("resultado", tabela)
+        try:
+            return cursor.execute(sql).arrow()
+        finally:
+            cursor.unregister("resultado")
+
+    def validar(self, sql):
+        """Confere se o SQL ainda é válido para o schema atual, sem executá-lo."""
+        try:
+            self.cursor().execute(f"EXPLAIN {sql}")
+        except duckdb.Error:
+            return False
+        return True
+
+    def aquecer(self, tabelas=TABELAS_AQUECIMENTO):
+        """Percorre as tabelas principais para trazê-las ao cache do DuckDB."""
+        cursor = self.conexao.cursor()
+        for tabela in tabelas:
+            colunas = [linha[0] for linha in cursor.execute(f"DESCRIBE {tabela}").fetchall()]
+            # Agregar todas as colunas força a leitura de todos os blocos
+            agregados = ", ".join(f'COUNT("{coluna}")' for coluna in colunas)
+            cursor.execute(f"SELECT {agregados} FROM {tabela}").fetchall()
+        cursor.close()
+
+    def fechar(self):
+        """Fecha os cursores e a conexão."""
+        with self._trava:
+            cursores, self._cursores = self._cursores, []
+        for cursor in cursores:
+            cursor.close()
+        self.conexao.close()
+
+
+class BancoAtual:
+    """Mantém aberta a versão atual do arquivo do banco.
+
+    O DuckDB devolve a instância já aberta para o mesmo caminho enquanto houver
+    uma conexão ou um cursor sobre ela. Se o arquivo for substituído, uma nova
+    conexão continuaria lendo o arquivo antigo. Por isso a conexão anterior e
+    todos os seus cursores são fechados antes de abrir o novo arquivo.
+    """
+
+    def __init__(self, caminho=CAMINHO_BANCO, aquecer=True):
+        self.caminho = caminho
+        self.aquecer = aquecer
+        self.impressao = None
+        self.banco = None
+        self._trava = threading.Lock()
+
+    def obter(self):
+        """`BancoDuckDB` da versão atual do arquivo, reaberto se a impressão digital mudou."""
+        impressao = impressao_banco(self.caminho)
+        if impressao != self.impressao:
+            with self._trava:
+                if impressao != self.impressao:
+                    if self.banco is not None:
+                        self.banco.fechar()
+                        self.banco = None
+                    banco = BancoDuckDB(self.caminho)
+                    if self.aquecer:
+                        banco.aquecer()
+                    self.banco, self.impressao = banco, impressao
+        return self.banco
+
+
+_atuais = {}
+_trava_atuais = threading.Lock()
+
+
+def banco_atual(caminho=CAMINHO_BANCO):
+    """Banco compartilhado pelo processo (aplicativo e página de administração).
+
+    Um único `BancoAtual` por arquivo: outra conexão ao mesmo caminho manteria
+    viva a instância do arquivo substituído.
+    """
+    with _trava_atuais:
+        atual = _atuais.setdefault(os.path.abspath(caminho), BancoAtual(caminho))
+    return atual.obter()
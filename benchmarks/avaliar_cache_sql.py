@@ -0,0 +1,48 @@
+"""Confere o nível por similaridade do cache de SQL contra perguntas quase idênticas.
+
+O cache é semeado com as perguntas de `sementes` de `corpus_cache_sql.json`
+(o SQL guardado é a própria pergunta). Cada caso traz a pergunta e a semente
+que deve ser reaproveitada, ou `null` quando a pergunta cita outro recorte,
+indicador ou ordenação e precisa ir para a LLM.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.avaliar_cache_sql --banco data/dados_reduzido.db
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from banco import CAMINHO_BANCO, BancoDuckDB
+from cache_sql import CacheSQL
+from planejador import Catalogo, Planejador
+
+CORPUS = os.path.join(os.path.dirname(__file__), "corpus_cache_sql.json")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--banco", default=CAMINHO_BANCO)
+    parser.add_argument("--corpus", default=CORPUS)
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as arquivo:
+        corpus = json.load(arquivo)
+
+    banco = BancoDuckDB(args.banco)
+    planejador = Planejador(Catalogo.do_banco(banco))
+    cache = CacheSQL(os.path.join(tempfile.mkdtemp(prefix="pndr_cache_"), "cache_sql.sqlite"))
+    for semente in corpus["sementes"]:
+        cache.gravar(semente, semente, 1.0)
+
+    falhas = 0
+    for caso in corpus["casos"]:
+        obtida = cache.buscar(caso["pergunta"], entidades=planejador.entidades)
+        if obtida != caso["esperada"]:
+            falhas += 1
+            print(f"FALHA: {caso['pergunta']}\n  esperada: {caso['esperada']}\n  obtida:   {obtida}")
+
+    print(f"{len(corpus['casos']) - falhas}/{len(corpus['casos'])} corretas; {cache.estatisticas}")
+    banco.fechar()
+    sys.exit(1 if falhas else 0)
@@ -0,0 +1,109 @@
+"""Confere a guarda de SQL contra um corpus de consultas boas e patológicas.
+
+Cada entrada de `corpus_guarda.json` traz o SQL e o resultado esperado:
+`aceita`, `reescrita` ou `rejeitada`. Opcionalmente, `contem` é um trecho que
+deve aparecer no SQL preparado e `sem_colunas` lista colunas que não podem
+voltar no resultado. As consultas aceitas são executadas para medir o tempo.
+Em seguida, o corpus é preparado de novo por várias threads ao mesmo tempo,
+como no aplicativo com várias sessões, conferindo que nenhuma trava.
+Requer um banco já preparado (`python preparar_banco.py`).
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.avaliar_guarda --banco data/dados_reduzido.db
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+from banco import CAMINHO_BANCO, BancoDuckDB
+from guarda_sql import ConsultaRejeitada, GuardaSQL
+
+CORPUS = os.path.join(os.path.dirname(__file__), "corpus_guarda.json")
+
+
+def avaliar(guarda, banco, caso):
+    """Devolve (resultado obtido, problema ou None, ms de preparo, ms de execução)."""
+    reescritas = guarda.estatisticas["reescritas"]
+    inicio = time.perf_counter()
+    try:
+        sql = guarda.preparar(banco, caso["sql"])
+    except ConsultaRejeitada as erro:
+        return "rejeitada", None, 1000 * (time.perf_counter() - inicio), 0.0
+    preparo = 1000 * (time.perf_counter() - inicio)
+    obtido = "reescrita" if guarda.estatisticas["reescritas"] > reescritas else "aceita"
+
+    inicio = time.perf_counter()
+    tabela = guarda.executar(banco, sql)
+    execucao = 1000 * (time.perf_counter() - inicio)
+
+    problema = None
+    if caso.get("contem") and caso["contem"] not in sql:
+        problema = f"trecho ausente: {caso['contem']}\n  obtido: {sql}"
+    presentes = set(caso.get("sem_colunas", [])) & set(tabela.column_names)
+    if presentes:
+        problema = f"colunas não removidas: {sorted(presentes)}"
+    return obtido, problema, preparo, execucao
+
+
+def preparar_concorrente(guarda, banco, corpus, threads, tempo_limite=60):
+    """Prepara e executa o corpus em `threads` threads simultâneas; devolve quantas travaram."""
+    def preparar_todos():
+        for caso in corpus:
+            try:
+                guarda.executar(banco, guarda.preparar(banco, caso["sql"]))
+            except ConsultaRejeitada:
+                pass
+
+    trabalhadoras = [threading.Thread(target=preparar_todos, daemon=True) for _ in range(threads)]
+    for trabalhadora in trabalhadoras:
+        trabalhadora.start()
+    limite = time.perf_counter() + tempo_limite
+    for trabalhadora in trabalhadoras:
+        trabalhadora.join(max(0.0, limite - time.perf_counter()))
+    return sum(trabalhadora.is_alive() for trabalhadora in trabalhadoras)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--banco", default=CAMINHO_BANCO)
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--log", action="store_true", help="mostra o log da guarda")
+    parser.add_argument("--threads", type=int, default=8, help="threads da preparação concorrente")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.log else logging.ERROR,
+                        format="  %(levelname)s %(message)s")
+
+    with open(args.corpus, encoding="utf-8") as arquivo:
+        corpus = json.load(arquivo)
+
+    banco = BancoDuckDB(args.banco)
+    guarda = GuardaSQL()
+
+    falhas = 0
+    for caso in corpus:
+        obtido, problema, preparo, execucao = avaliar(guarda, banco, caso)
+        if obtido != caso["esperado"]:
+            problema = f"esperado {caso['esperado']}, obtido {obtido}"
+        print(f"{'FALHA' if problema else 'ok':5s} {obtido:9s} preparo {preparo:7.1f} ms  "
+              f"execução {execucao:8.1f} ms  {caso['nome']}")
+        if problema:
+            falhas += 1
+            print(f"  {problema}")
+
+    print(f"{len(corpus) - falhas}/{len(corpus)} corretas; {guarda.estatisticas}")
+
+    inicio = time.perf_counter()
+    travadas = preparar_concorrente(guarda, banco, corpus, args.threads)
+    if travadas:
+        # Threads travadas no DuckDB impedem o encerramento normal do processo
+        print(f"FALHA {travadas}/{args.threads} threads travadas na preparação concorrente")
+        os._exit(1)
+    print(f"preparação concorrente: {args.threads} threads × {len(corpus)} consultas "
+          f"em {time.perf_counter() - inicio:.1f} s")
+    banco.fechar()
+    sys.exit(1 if falhas else 0)
@@ -0,0 +1,115 @@
+"""Confere a malha local gerada a partir da amostra `malha_amostra.geojson`.
+
+A amostra tem 14 municípios de três UFs em duas regiões: uma grade com
+fronteiras irregulares compartilhadas, um enclave (buraco no município que o
+cerca), um MultiPolygon com ilha e um município menor que a tolerância de z4.
+Para cada nível, confere:
+
+- `construir_malha` e o índice por UF e região;
+- `MalhaMunicipal.features`, `por_uf` e `por_regiao`;
+- os deslocamentos do índice (cada trecho do arquivo é a feature do código);
+- que nenhum município fica sem geometria;
+- que as fronteiras comuns continuam comuns: todo segmento usado por um só
+  anel liga dois vértices da borda externa da amostra (sem frestas) e nenhum
+  segmento é usado por mais de dois anéis (sem sobreposições).
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.avaliar_malha
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from malha import MalhaMunicipal, construir_malha
+
+AMOSTRA = os.path.join(os.path.dirname(__file__), "malha_amostra.geojson")
+
+
+def _segmentos(features):
+    """{segmento sem sentido: número de anéis que o usam}."""
+    contagem = {}
+    for feature in features:
+        geometria = feature["geometry"]
+        poligonos = [geometria["coordinates"]] if geometria["type"] == "Polygon" else geometria["coordinates"]
+        for poligono in poligonos:
+            for anel in poligono:
+                for a, b in zip(anel, anel[1:]):
+                    chave = tuple(sorted((tuple(a), tuple(b))))
+                    contagem[chave] = contagem.get(chave, 0) + 1
+    return contagem
+
+
+def conferir(geojson, diretorio):
+    falhas = []
+    codigos = sorted(str(f["properties"]["codarea"]) for f in geojson["features"])
+    ufs = {}
+    for codigo in codigos:
+        ufs.setdefault(codigo[:2], []).append(codigo)
+    regioes = {}
+    for uf in sorted(ufs):
+        regioes.setdefault(uf[0], []).append(uf)
+
+    indice = construir_malha(geojson, diretorio)
+    if sorted(indice["ufs"]) != sorted(ufs) or indice["regioes"] != regioes:
+        falhas.append(f"índice com UFs {sorted(indice['ufs'])} e regiões {indice['regioes']}")
+
+    # Vértices da borda externa da amostra: os de segmentos usados por um só anel
+    borda = {p for segmento, n in _segmentos(geojson["features"]).items() if n == 1 for p in segmento}
+
+    malha = MalhaMunicipal(diretorio)
+    for nivel in malha.niveis:
+        features = malha.features(codigos + ["9999999"], nivel)
+        if [f["properties"]["codarea"] for f in features] != codigos:
+            falhas.append(f"{nivel}: features devolveu {len(features)} de {len(codigos)} municípios")
+        for uf, esperados in ufs.items():
+            obtidos = [f["properties"]["codarea"] for f in malha.por_uf(uf, nivel)["features"]]
+            if obtidos != esperados:
+                falhas.append(f"{nivel}: por_uf({uf}) devolveu {obtidos}")
+        for regiao, lista in regioes.items():
+            esperados = [c for uf in lista for c in ufs[uf]]
+            obtidos = [f["properties"]["codarea"] for f in malha.por_regiao(regiao, nivel)["features"]]
+            if obtidos != esperados:
+                falhas.append(f"{nivel}: por_regiao({regiao}) devolveu {obtidos}")
+
+        # Deslocamentos lidos direto do arquivo, sem o mmap da MalhaMunicipal
+        for uf, deslocamentos in indice["ufs"].items():
+            with open(os.path.join(diretorio, nivel, f"{uf}.geojsonl"), "rb") as arquivo:
+                conteudo = arquivo.read()
+            for codigo, (inicio, tamanho) in deslocamentos[nivel].items():
+                feature = json.loads(conteudo[inicio:inicio + tamanho])
+                if feature["properties"]["codarea"] != codigo:
+                    falhas.append(f"{nivel}: deslocamento de {codigo} aponta para {feature['properties']['codarea']}")
+
+        vertices = 0
+        for feature in features:
+            geometria = feature["geometry"]
+            poligonos = [geometria["coordinates"]] if geometria["type"] == "Polygon" else geometria["coordinates"]
+            aneis = [anel for poligono in poligonos for anel in poligono]
+            vertices += sum(len(anel) for anel in aneis)
+            if not aneis or any(len(anel) < 4 or anel[0] != anel[-1] for anel in aneis):
+                falhas.append(f"{nivel}: {feature['properties']['codarea']} sem geometria válida")
+
+        for segmento, n in _segmentos(features).items():
+            if n > 2:
+                falhas.append(f"{nivel}: segmento {segmento} usado por {n} anéis (sobreposição)")
+            elif n == 1 and not set(segmento) <= borda:
+                falhas.append(f"{nivel}: segmento {segmento} sem vizinho (fresta)")
+        print(f"{nivel}: {len(features)} municípios, {vertices} vértices")
+    malha.fechar()
+    return falhas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--amostra", default=AMOSTRA)
+    args = parser.parse_args()
+
+    with open(args.amostra, encoding="utf-8") as arquivo:
+        geojson = json.load(arquivo)
+    falhas = conferir(geojson, tempfile.mkdtemp(prefix="pndr_malha_"))
+    for falha in falhas:
+        print(f"FALHA: {falha}")
+    print("ok" if not falhas else f"{len(falhas)} falhas")
+    sys.exit(1 if falhas else 0)
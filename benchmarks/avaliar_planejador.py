@@ -0,0 +1,52 @@
+"""Confere o planejador determinístico contra o corpus de perguntas de exemplo.
+
+Cada entrada de `corpus_planejador.json` traz a pergunta e o SQL esperado;
+`"sql": null` indica que a pergunta deve ser encaminhada à LLM. As perguntas
+agregadas esperam o SQL do cubo; o banco precisa ter `cubo_recortes`.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.avaliar_planejador
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+from banco import CAMINHO_BANCO, BancoDuckDB
+from planejador import Catalogo, Planejador
+
+CORPUS = os.path.join(os.path.dirname(__file__), "corpus_planejador.json")
+
+
+def _compactar(sql):
+    return re.sub(r"\s+", " ", sql).strip() if sql else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--banco", default=CAMINHO_BANCO)
+    parser.add_argument("--corpus", default=CORPUS)
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as arquivo:
+        corpus = json.load(arquivo)
+
+    banco = BancoDuckDB(args.banco)
+    planejador = Planejador(Catalogo.do_banco(banco))
+
+    falhas, tempos = 0, []
+    for caso in corpus:
+        inicio = time.perf_counter()
+        sql, confianca = planejador.planejar(caso["pergunta"])
+        tempos.append(time.perf_counter() - inicio)
+        if _compactar(sql) != _compactar(caso["sql"]):
+            falhas += 1
+            print(f"FALHA ({confianca:.2f}): {caso['pergunta']}\n  esperado: {caso['sql']}\n  obtido:   {sql}")
+
+    resolvidas = sum(1 for caso in corpus if caso["sql"])
+    print(f"{len(corpus) - falhas}/{len(corpus)} corretas, {resolvidas} resolvidas sem LLM, "
+          f"latência média {1000 * sum(tempos) / len(tempos):.2f} ms")
+    banco.fechar()
+    sys.exit(1 if falhas else 0)
@@ -0,0 +1,84 @@
+"""Confere que substituir o arquivo do banco reabre a conexão compartilhada.
+
+Gera dois bancos sintéticos pequenos com sementes diferentes, abre o
+primeiro por `banco.banco_atual` (com cursores em outras threads e o cursor
+do cubo, como no aplicativo), troca o arquivo com `os.replace` e confere que
+as consultas, o cubo e o catálogo do planejador passam a ler o novo arquivo.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.avaliar_troca_banco
+"""
+import os
+import sys
+import tempfile
+import threading
+
+import duckdb
+
+from banco import banco_atual, impressao_banco
+from benchmarks.dados_sinteticos import criar_banco
+from cubo import CuboRecortes
+from planejador import Catalogo
+
+CONSULTA = "SELECT round(SUM(value), 4) FROM valoresmeta"
+INDICADOR = "Desnutrição"
+
+
+def _estado(banco):
+    """(soma dos valores, média nacional do indicador no cubo, nº de municípios no catálogo)."""
+    soma = banco.executar(CONSULTA).fetchone()[0]
+    ano = banco.executar("SELECT MAX(ano) FROM valoresmeta").fetchone()[0]
+    referencia = CuboRecortes(banco).referencias(INDICADOR, ano, ("brasil",))
+    municipios = len(Catalogo.do_banco(banco).recortes["município"])
+    return soma, referencia["brasil"]["Brasil"]["media"], municipios
+
+
+if __name__ == "__main__":
+    diretorio = tempfile.mkdtemp(prefix="pndr_troca_")
+    caminho = os.path.join(diretorio, "dados_reduzido.db")
+    novo = os.path.join(diretorio, "novo.db")
+    criar_banco(caminho, municipios=100, indicadores=3, anos=range(2020, 2022), semente=0)
+    criar_banco(novo, municipios=120, indicadores=3, anos=range(2020, 2022), semente=1)
+
+    # Valores esperados lidos direto do novo arquivo, antes da troca
+    conexao = duckdb.connect(novo, read_only=True)
+    esperada = conexao.execute(CONSULTA).fetchone()[0]
+    conexao.close()
+
+    antigo = banco_atual(caminho)
+    antes = _estado(antigo)
+    # Cursores de outras sessões também seguram a instância do arquivo antigo
+    sessoes = [threading.Thread(target=antigo.executar, args=(CONSULTA,)) for _ in range(4)]
+    for sessao in sessoes:
+        sessao.start()
+    for sessao in sessoes:
+        sessao.join()
+
+    impressao = impressao_banco(caminho)
+    os.replace(novo, caminho)
+    falhas = []
+    if impressao_banco(caminho) == impressao:
+        falhas.append("a impressão digital não mudou com a troca do arquivo")
+
+    atual = banco_atual(caminho)
+    depois = _estado(atual)
+    if atual is antigo:
+        falhas.append("banco_atual devolveu a conexão anterior")
+    if depois[0] != esperada:
+        falhas.append(f"soma {depois[0]} após a troca; esperada {esperada} (antes {antes[0]})")
+    if depois[1] == antes[1]:
+        falhas.append(f"média do cubo não mudou ({depois[1]})")
+    if depois[2] == antes[2]:
+        falhas.append(f"catálogo com {depois[2]} municípios, igual ao do arquivo antigo")
+    try:
+        antigo.executar(CONSULTA)
+        falhas.append("a conexão anterior continua aberta")
+    except duckdb.Error:
+        pass
+
+    print(f"antes  soma {antes[0]}  média {antes[1]}  municípios {antes[2]}")
+    print(f"depois soma {depois[0]}  média {depois[1]}  municípios {depois[2]}")
+    for falha in falhas:
+        print(f"FALHA: {falha}")
+    atual.fechar()
+    sys.exit(1 if falhas else 0)
@@ -0,0 +1,70 @@
+"""Latência de `fetch_data` com conexão por consulta vs. conexão compartilhada.
+
+Simula N sessões concorrentes executando as mesmas consultas e reporta p50/p95.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_conexao --sessoes 8 --repeticoes 20
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import duckdb
+
+from banco import CAMINHO_BANCO, BancoDuckDB
+
+CONSULTAS = [
+    """SELECT r.codigo_ibge, r.município, r.estado, v.value, v.data_name
+       FROM valoresmeta AS v
+       LEFT JOIN recortes_geograficos AS r ON r.codigo_ibge = v.geoloc_id
+       WHERE r.estado LIKE '%Bahia%' AND v.data_name LIKE '%Sustentabilidade Fiscal%'""",
+    """SELECT r.codigo_ibge, r.município, v.value
+       FROM valoresmeta AS v
+       LEFT JOIN recortes_geograficos AS r ON r.codigo_ibge = v.geoloc_id
+       WHERE r.regiao_imediata LIKE '%Toledo%' AND v.data_name LIKE '%Desmatamento%'""",
+    "SELECT codigo_ibge, município, estado FROM recortes_geograficos",
+]
+
+
+def caminho_antigo(sql, caminho):
+    """Comportamento anterior: abre e fecha a conexão a cada consulta."""
+    conn = duckdb.connect(caminho)
+    df = conn.execute(sql).fetchdf()
+    conn.close()
+    return df
+
+
+def sessao(executar, repeticoes):
+    latencias = []
+    for i in range(repeticoes):
+        sql = CONSULTAS[i % len(CONSULTAS)]
+        inicio = time.perf_counter()
+        executar(sql)
+        latencias.append(time.perf_counter() - inicio)
+    return latencias
+
+
+def medir(executar, sessoes, repeticoes):
+    with ThreadPoolExecutor(max_workers=sessoes) as executor:
+        resultados = executor.map(lambda _: sessao(executar, repeticoes), range(sessoes))
+        latencias = sorted(l for r in resultados for l in r)
+    quantis = statistics.quantiles(latencias, n=100)
+    return quantis[49] * 1000, quantis[94] * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--banco", default=CAMINHO_BANCO)
+    parser.add_argument("--sessoes", type=int, default=8)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    p50, p95 = medir(lambda sql: caminho_antigo(sql, args.banco), args.sessoes, args.repeticoes)
+    print(f"conexão por consulta:  p50={p50:8.1f} ms  p95={p95:8.1f} ms")
+
+    banco = BancoDuckDB(args.banco)
+    banco.aquecer()
+    p50, p95 = medir(lambda sql: banco.executar(sql).fetchdf(), args.sessoes, args.repeticoes)
+    print(f"conexão compartilhada: p50={p50:8.1f} ms  p95={p95:8.1f} ms")
+    banco.fechar()
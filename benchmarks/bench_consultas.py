@@ -0,0 +1,73 @@
+"""Compara os formatos de query antigos e os que usam as tabelas de `preparar_banco.py`.
+
+Formato antigo: `strftime('%Y', refdate)`, `data_name LIKE` e subconsulta
+correlacionada `MAX(refdate)`. Formato novo: `ano`, `indicadores` e
+`valoresmeta_latest`. Requer um banco já preparado.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_consultas --repeticoes 10
+"""
+import argparse
+import statistics
+import time
+
+from banco import CAMINHO_BANCO, BancoDuckDB
+
+SELECT = """SELECT r.codigo_ibge, r.município, r.estado, v.value, v.data_name
+FROM {tabela} AS v
+LEFT JOIN recortes_geograficos AS r ON r.codigo_ibge = v.geoloc_id
+WHERE {filtros}"""
+
+CASOS = {
+    "indicador e ano": (
+        SELECT.format(tabela="valoresmeta", filtros=(
+            "r.estado LIKE '%Bahia%' AND v.data_name LIKE '%Sustentabilidade Fiscal%' "
+            "AND strftime('%Y', v.refdate) = '2022'")),
+        SELECT.format(tabela="valoresmeta", filtros=(
+            "r.estado LIKE '%Bahia%' AND v.indicador_id IN (SELECT indicador_id FROM indicadores "
+            "WHERE data_name LIKE '%Sustentabilidade Fiscal%') AND v.ano = 2022")),
+    ),
+    "valor mais recente": (
+        SELECT.format(tabela="valoresmeta", filtros=(
+            "r.estado LIKE '%Sergipe%' AND v.data_name LIKE '%Taxa de Variação Populacional%' "
+            "AND v.refdate = (SELECT MAX(refdate) FROM valoresmeta "
+            "WHERE geoloc_id = v.geoloc_id AND data_name = v.data_name)")),
+        SELECT.format(tabela="valoresmeta_latest", filtros=(
+            "r.estado LIKE '%Sergipe%' AND v.indicador_id IN (SELECT indicador_id FROM indicadores "
+            "WHERE data_name LIKE '%Taxa de Variação Populacional%')")),
+    ),
+    "nacional, mais recente": (
+        SELECT.format(tabela="valoresmeta", filtros=(
+            "v.data_name LIKE '%Desnutrição%' AND v.refdate = (SELECT MAX(refdate) FROM valoresmeta "
+            "WHERE geoloc_id = v.geoloc_id AND data_name = v.data_name)")),
+        SELECT.format(tabela="valoresmeta_latest", filtros=(
+            "v.indicador_id IN (SELECT indicador_id FROM indicadores WHERE data_name LIKE '%Desnutrição%')")),
+    ),
+}
+
+
+def mediana_ms(banco, sql, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        banco.executar(sql).fetchall()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--banco", default=CAMINHO_BANCO)
+    parser.add_argument("--repeticoes", type=int, default=10)
+    args = parser.parse_args()
+
+    banco = BancoDuckDB(args.banco)
+    banco.aquecer()
+    for nome, (antiga, nova) in CASOS.items():
+        linhas_antiga = len(banco.executar(antiga).fetchall())
+        linhas_nova = len(banco.executar(nova).fetchall())
+        t_antiga = mediana_ms(banco, antiga, args.repeticoes)
+        t_nova = mediana_ms(banco, nova, args.repeticoes)
+        print(f"{nome:24s} antiga {t_antiga:8.1f} ms ({linhas_antiga} linhas)  "
+              f"nova {t_nova:8.1f} ms ({linhas_nova} linhas)  {t_antiga / t_nova:5.1f}x")
+    banco.fechar()
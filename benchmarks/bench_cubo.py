@@ -0,0 +1,55 @@
+"""Compara perguntas agregadas calculadas sobre `valoresmeta` e lidas do cubo.
+
+Para cada recorte, agrega o indicador por município na hora (GROUP BY com
+mediana) e lê as mesmas médias de `cubo_recortes`, conferindo que os valores
+coincidem. Requer um banco preparado e com o cubo (`python cubo.py`).
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_cubo --repeticoes 10
+"""
+import argparse
+import math
+
+from banco import CAMINHO_BANCO, BancoDuckDB
+from benchmarks.bench_consultas import mediana_ms
+from cubo import sql_consulta
+
+AGREGADO = """SELECT {coluna} AS valor, AVG(v.value) AS value, median(v.value) AS mediana, COUNT(*) AS n
+FROM valoresmeta AS v
+JOIN recortes_geograficos AS r ON r.codigo_ibge = v.geoloc_id
+WHERE v.indicador_id IN (SELECT indicador_id FROM indicadores WHERE data_name LIKE '%{trecho}%')
+  AND v.ano = {ano} AND v.value IS NOT NULL
+GROUP BY ALL
+ORDER BY value DESC"""
+
+RECORTES = {
+    "brasil": "'Brasil'",
+    "estado": 'r."estado"',
+    "região": 'r."região"',
+    "participacao_semiarido": "r.participacao_semiarido",
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--banco", default=CAMINHO_BANCO)
+    parser.add_argument("--indicador", default="Desnutrição")
+    parser.add_argument("--ano", type=int, default=2020)
+    parser.add_argument("--repeticoes", type=int, default=10)
+    args = parser.parse_args()
+
+    banco = BancoDuckDB(args.banco)
+    banco.aquecer()
+    for recorte, coluna in RECORTES.items():
+        na_hora = AGREGADO.format(coluna=coluna, trecho=args.indicador, ano=args.ano)
+        do_cubo = sql_consulta(args.indicador, recorte, None, args.ano)
+        esperado = {l[0]: l[1] for l in banco.executar(na_hora).fetchall()}
+        # valor e value são a 4ª e a 6ª colunas do SQL do cubo
+        obtido = {l[3]: l[5] for l in banco.executar(do_cubo).fetchall()}
+        iguais = esperado.keys() == obtido.keys() and all(
+            math.isclose(esperado[k], obtido[k], rel_tol=1e-9) for k in esperado)
+        t_hora = mediana_ms(banco, na_hora, args.repeticoes)
+        t_cubo = mediana_ms(banco, do_cubo, args.repeticoes)
+        print(f"{recorte:24s} na hora {t_hora:8.1f} ms  cubo {t_cubo:6.1f} ms  "
+              f"{t_hora / t_cubo:6.1f}x  {len(obtido)} grupos  {'ok' if iguais else 'DIVERGENTE'}")
+    banco.fechar()
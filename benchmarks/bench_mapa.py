@@ -0,0 +1,79 @@
+"""Tamanho do HTML e tempo de renderização do mapa: malha nacional completa vs. camadas por UF.
+
+Usa a malha local (`python malha.py`) ou, com `--sintetica`, uma malha gerada
+em diretório temporário. O caminho anterior embute a malha nacional inteira
+em todo mapa; o atual embute só os municípios do resultado, simplificados e
+quantizados, a partir das camadas em cache.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_mapa --sintetica
+    python -m benchmarks.bench_mapa --original malha_ibge.json
+"""
+import argparse
+import json
+import tempfile
+import time
+
+import folium
+import pandas as pd
+
+from benchmarks.dados_sinteticos import malha_sintetica
+from malha import DIRETORIO_MALHA, MalhaMunicipal, construir_malha
+from mapa import CamadasMapa
+
+
+def renderizar(geojson, df, zoom):
+    """Monta o mapa como `create_map` e devolve o HTML."""
+    m = folium.Map(location=[-15, -50], zoom_start=zoom)
+    folium.Choropleth(
+        geo_data=geojson,
+        name="Indicador",
+        data=df,
+        columns=["codarea", "value"],
+        key_on="feature.properties.codarea",
+        fill_color="YlGn",
+        fill_opacity=0.8,
+        line_weight=0.1,
+    ).add_to(m)
+    return m.get_root().render()
+
+
+def medir(geojson_fn, df, zoom):
+    inicio = time.perf_counter()
+    html = renderizar(geojson_fn(), df, zoom)
+    return len(html.encode("utf-8")) / 1024 ** 2, time.perf_counter() - inicio
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--malha", default=DIRETORIO_MALHA)
+    parser.add_argument("--original", help="GeoJSON nacional do IBGE para o caminho anterior")
+    parser.add_argument("--sintetica", action="store_true", help="gera uma malha sintética")
+    args = parser.parse_args()
+
+    if args.sintetica:
+        original = malha_sintetica()
+        args.malha = tempfile.mkdtemp()
+        construir_malha(original, args.malha)
+    elif args.original:
+        with open(args.original, encoding="utf-8") as arquivo:
+            original = json.load(arquivo)
+    else:
+        parser.error("informe --original (GeoJSON do IBGE) ou --sintetica")
+
+    camadas = CamadasMapa(MalhaMunicipal(args.malha))
+    codigos = [f["properties"]["codarea"] for f in original["features"]]
+    casos = {
+        "uma UF": (pd.DataFrame({"codarea": [c for c in codigos if c.startswith("41")], "value": 1.0}), 7),
+        "nacional": (pd.DataFrame({"codarea": codigos, "value": 1.0}), 4),
+    }
+
+    for nome, (df, zoom) in casos.items():
+        nivel = camadas.nivel_para_zoom(zoom)
+        anterior = medir(lambda: original, df, zoom)
+        primeira = medir(lambda: camadas.geojson(df["codarea"], nivel), df, zoom)
+        em_cache = medir(lambda: camadas.geojson(df["codarea"], nivel), df, zoom)
+        print(f"{nome:9s} ({len(df)} municípios, nível {nivel})")
+        print(f"  malha completa     {anterior[0]:8.2f} MiB  {anterior[1]:6.2f} s")
+        print(f"  camadas por UF     {primeira[0]:8.2f} MiB  {primeira[1]:6.2f} s")
+        print(f"  camadas em cache   {em_cache[0]:8.2f} MiB  {em_cache[1]:6.2f} s")
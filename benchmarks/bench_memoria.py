@@ -0,0 +1,78 @@
+"""Pico de memória do caminho do resultado: pandas (anterior) vs. Arrow (atual).
+
+Gera um resultado sintético grande no DuckDB e reproduz, em processos
+separados, o que cada versão faz com ele: a anterior materializa tudo em
+pandas e copia para tabela, gráfico, mapa e JSON; a atual mantém a tabela
+Arrow limitada, pagina por fatias e agrega o gráfico no DuckDB.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_memoria --linhas 2000000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import duckdb
+import pyarrow as pa
+
+from banco import LIMITE_LINHAS, BancoDuckDB
+from resumo import preparar_payload
+
+CONSULTA = """
+SELECT
+    (1100000 + i % 5570)::BIGINT AS codigo_ibge,
+    'Município ' || (i % 5570) AS "município",
+    'Estado ' || (i % 27) AS estado,
+    random() * 100 AS value,
+    (2015 + i // 5570 % 8)::INTEGER AS ano,
+    'Indicador ' || (i // 44560) AS data_name,
+    -10.0 - (i % 5570) / 1000 AS latitude,
+    -50.0 + (i % 5570) / 1000 AS longitude
+FROM range({linhas}) t(i)
+"""
+
+
+def caminho_anterior(linhas):
+    conn = duckdb.connect()
+    df = conn.execute(CONSULTA.format(linhas=linhas)).fetchdf()
+    pa.Table.from_pandas(df)                                   # st.dataframe
+    df[["município", "value"]].copy()                          # px.bar
+    df.rename(columns={"codigo_ibge": "codarea"})              # create_map
+    df.to_json(orient="records")                               # analyze_data
+
+
+def caminho_atual(linhas):
+    # BancoDuckDB abre somente leitura, o que exige um arquivo
+    caminho = os.path.join(tempfile.mkdtemp(), "vazio.db")
+    duckdb.connect(caminho).close()
+    banco = BancoDuckDB(caminho)
+    tabela = banco.buscar_arrow(CONSULTA.format(linhas=linhas), LIMITE_LINHAS)
+    tabela.slice(0, 1000)                                       # show_table
+    banco.consultar_arrow(tabela, """
+        SELECT "município", AVG(value) AS value FROM resultado
+        GROUP BY "município" ORDER BY value DESC LIMIT 50""")  # plot_data
+    tabela.select(["codigo_ibge", "latitude", "longitude", "value"]).to_pandas()  # create_map
+    preparar_payload(tabela)                                    # analyze_data
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=2_000_000)
+    parser.add_argument("--modo", choices=("anterior", "atual"))
+    args = parser.parse_args()
+
+    if args.modo:
+        inicio = time.perf_counter()
+        (caminho_anterior if args.modo == "anterior" else caminho_atual)(args.linhas)
+        pico_mib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{args.modo:9s} pico de memória {pico_mib:8.1f} MiB  tempo {time.perf_counter() - inicio:6.2f} s")
+    else:
+        # Cada caminho roda num processo próprio para medir o pico isoladamente
+        print(f"{args.linhas} linhas (limite atual: {LIMITE_LINHAS})")
+        for modo in ("anterior", "atual"):
+            subprocess.run([sys.executable, "-m", "benchmarks.bench_memoria",
+                            "--linhas", str(args.linhas), "--modo", modo], check=True)
@@ -0,0 +1,110 @@
+"""Mede a partida a frio e o custo de cada rerun de `app.py`.
+
+Cada medição roda num processo novo, no diretório de trabalho do teste de
+carga (banco e malha sintéticos):
+
+- `python -X importtime -c "import app"`: tempo acumulado de importação do
+  aplicativo e dos módulos pesados (os ausentes não foram importados);
+- `streamlit.testing.v1.AppTest`: a primeira execução do script (partida a
+  frio, com os recursos em cache ainda vazios) e a mediana das seguintes,
+  que são os reruns de cada interação.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_partida --diretorio /tmp/pndr --reruns 20
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.carga import RAIZ, preparar_diretorio
+
+# Módulos cujo tempo de importação é relatado
+MODULOS = (
+    "streamlit", "pandas", "pyarrow", "duckdb", "openai", "google.genai", "plotly.express",
+    "folium", "streamlit_folium", "altair", "requests",
+)
+
+# Executado num processo novo: partida a frio e reruns pelo AppTest
+APPTEST = """
+import json, statistics, sys, time
+from streamlit.testing.v1 import AppTest
+teste = AppTest.from_file(sys.argv[1], default_timeout=300)
+inicio = time.perf_counter()
+teste.run()
+partida = time.perf_counter() - inicio
+reruns = []
+for _ in range(int(sys.argv[2])):
+    inicio = time.perf_counter()
+    teste.run()
+    reruns.append(time.perf_counter() - inicio)
+print(json.dumps({"partida_s": partida, "rerun_s": statistics.median(reruns),
+                  "erros": [str(e.value) for e in teste.exception]}))
+"""
+
+
+def _ambiente():
+    # Chaves fictícias: os clientes das LLMs não fazem chamadas durante a partida
+    ambiente = dict(os.environ, PYTHONPATH=RAIZ)
+    ambiente.setdefault("OPENAI_API_KEY", "bench")
+    ambiente.setdefault("GEMINI_API_KEY", "bench")
+    return ambiente
+
+
+def tempos_importacao(diretorio):
+    """{módulo: segundos acumulados} do primeiro import de cada módulo, e o total de `app`."""
+    saida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=diretorio, env=_ambiente(), capture_output=True, text=True, check=True,
+    ).stderr
+    tempos = {}
+    for linha in saida.splitlines():
+        encontrado = re.match(r"import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)$", linha)
+        if encontrado and encontrado.group(2) not in tempos:
+            tempos[encontrado.group(2)] = int(encontrado.group(1)) / 1e6
+    return tempos
+
+
+def partida_e_reruns(diretorio, reruns):
+    saida = subprocess.run(
+        [sys.executable, "-c", APPTEST, os.path.join(RAIZ, "app.py"), str(reruns)],
+        cwd=diretorio, env=_ambiente(), capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--diretorio", help="diretório de trabalho de `benchmarks.carga` (padrão: temporário)")
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--repeticoes", type=int, default=3, help="processos novos por medição")
+    parser.add_argument("--municipios", type=int, default=5570)
+    parser.add_argument("--indicadores", type=int, default=50)
+    parser.add_argument("--anos", type=int, default=8)
+    parser.add_argument("--latencia-ibge", type=float, default=0.0)
+    args = parser.parse_args()
+
+    diretorio = os.path.abspath(args.diretorio or tempfile.mkdtemp(prefix="pndr_partida_"))
+    preparo = multiprocessing.get_context("spawn").Process(target=preparar_diretorio, args=(diretorio, args))
+    preparo.start()
+    preparo.join()
+    if preparo.exitcode != 0:
+        sys.exit("falha ao preparar o diretório de trabalho")
+
+    # Mínimo entre processos, para reduzir o ruído de disco e CPU
+    importacoes = [tempos_importacao(diretorio) for _ in range(args.repeticoes)]
+    print(f"{'módulo':18s} importação (acumulado)")
+    for modulo in ("app",) + MODULOS:
+        valores = [t[modulo] for t in importacoes if modulo in t]
+        print(f"{modulo:18s} " + (f"{1000 * min(valores):8.1f} ms" if valores else "não importado"))
+
+    execucoes = [partida_e_reruns(diretorio, args.reruns) for _ in range(args.repeticoes)]
+    for execucao in execucoes:
+        for erro in execucao["erros"]:
+            print(f"  erro: {erro}")
+    print(f"partida a frio {min(e['partida_s'] for e in execucoes) * 1000:8.1f} ms")
+    print(f"rerun (mediana) {min(e['rerun_s'] for e in execucoes) * 1000:7.1f} ms")
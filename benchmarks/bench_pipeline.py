@@ -0,0 +1,102 @@
+"""Tempo de renderização com a análise sequencial vs. em segundo plano.
+
+Usa o diretório de trabalho do teste de carga (banco e malha sintéticos) e o
+`app.py` real, com o Gemini substituído por `benchmarks.substitutos.GeminiSubstituto`
+(latência artificial até o primeiro trecho e entre trechos). Para cada
+pergunta, a tabela é buscada uma vez e o desenho é medido nos dois fluxos,
+sempre com `analyze_data_stream`, `show_table`, `plot_data` e `create_map`:
+
+- sequencial: a análise completa antes de tabela, gráfico e mapa;
+- concorrente: a análise em `AnaliseEmSegundoPlano` enquanto eles são desenhados.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_pipeline --diretorio /tmp/pndr --primeiro-trecho 3 --trechos 40
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.carga import RAIZ, importar_app, preparar_diretorio
+from pipeline import AnaliseEmSegundoPlano
+
+PERGUNTAS = (
+    "Crie um mapa do indicador Distorção Idade-Série para o Paraná em 2020",
+    "Crie um gráfico do indicador de Desmatamento paro o Pará em 2021",
+)
+
+
+def desenhar(app, tabela):
+    app.show_table(tabela)
+    app.plot_data(tabela)
+    app.create_map(tabela)
+
+
+def sequencial(app, tabela, analisar):
+    """Fluxo anterior: a análise completa antes de tabela, gráfico e mapa."""
+    inicio = time.perf_counter()
+    "".join(analisar())
+    texto = time.perf_counter() - inicio
+    desenhar(app, tabela)
+    visuais = time.perf_counter() - inicio
+    return visuais, texto, time.perf_counter() - inicio
+
+
+def concorrente(app, tabela, analisar):
+    """Fluxo atual: a análise em segundo plano e os trechos exibidos ao chegar."""
+    inicio = time.perf_counter()
+    analise = AnaliseEmSegundoPlano(analisar)
+    desenhar(app, tabela)
+    visuais = time.perf_counter() - inicio
+    primeiro = None
+    for _ in analise.trechos():
+        if primeiro is None:
+            primeiro = time.perf_counter() - inicio
+    return visuais, primeiro, time.perf_counter() - inicio
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--diretorio", help="diretório de trabalho de `benchmarks.carga` (padrão: temporário)")
+    parser.add_argument("--primeiro-trecho", type=float, default=3.0, help="segundos até o 1º trecho")
+    parser.add_argument("--trechos", type=int, default=40)
+    parser.add_argument("--intervalo", type=float, default=0.05, help="segundos entre trechos")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--municipios", type=int, default=5570)
+    parser.add_argument("--indicadores", type=int, default=50)
+    parser.add_argument("--anos", type=int, default=8)
+    parser.add_argument("--latencia-ibge", type=float, default=0.0)
+    args = parser.parse_args()
+    # O SQL vem do planejador; o substituto da OpenAI só atende perguntas fora dele
+    args.latencia_openai = 0.0
+
+    diretorio = os.path.abspath(args.diretorio or tempfile.mkdtemp(prefix="pndr_pipeline_"))
+    preparo = multiprocessing.get_context("spawn").Process(target=preparar_diretorio, args=(diretorio, args))
+    preparo.start()
+    preparo.join()
+    if preparo.exitcode != 0:
+        sys.exit("falha ao preparar o diretório de trabalho")
+    sys.path.insert(0, RAIZ)
+    os.chdir(diretorio)
+
+    # Fora do `streamlit run`, cada chamada a `st.*` emite um aviso; só erros são exibidos
+    logging.disable(logging.WARNING)
+    app = importar_app(args, [])
+    recortes, cubo, cliente = app.get_recortes(), app.get_cubo(), app.get_cliente_gemini()
+
+    for pergunta in PERGUNTAS:
+        tabela = app.fetch_data(app.gerar_sql(pergunta))
+        def analisar():
+            return app.analyze_data_stream(tabela, recortes, cubo, cliente)
+        # Aquece as camadas do mapa e o gráfico para que os dois fluxos partam do mesmo estado
+        desenhar(app, tabela)
+        print(f"{pergunta} ({tabela.num_rows} linhas)")
+        for nome, executar in (("sequencial", sequencial), ("concorrente", concorrente)):
+            medidas = [executar(app, tabela, analisar) for _ in range(args.repeticoes)]
+            visuais, primeiro, total = (statistics.median(m[i] for m in medidas) for i in range(3))
+            print(f"  {nome:12s} tabela+gráfico+mapa em {visuais:5.2f} s, "
+                  f"análise visível em {primeiro:5.2f} s, total {total:5.2f} s")
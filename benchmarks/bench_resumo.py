@@ -0,0 +1,62 @@
+"""Tamanho e tempo de serialização do payload da análise: linhas completas vs. resumo.
+
+Usa um resultado sintético no formato das consultas do aplicativo
+(município, estado, valor, ano, indicador).
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.bench_resumo --municipios 5570 --anos 8
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from resumo import estimar_tokens, preparar_payload
+
+ESTADOS = ["Bahia", "Pará", "Maranhão", "Paraná", "Sergipe", "Mato Grosso", "São Paulo"]
+
+
+def resultado_sintetico(municipios, anos, indicadores):
+    rng = np.random.default_rng(0)
+    codigos = np.arange(municipios) + 1100000
+    linhas = municipios * anos * indicadores
+    df = pd.DataFrame({
+        "codigo_ibge": np.tile(codigos, anos * indicadores),
+        "município": np.tile([f"Município {c}" for c in codigos], anos * indicadores),
+        "estado": np.tile(np.array(ESTADOS)[codigos % len(ESTADOS)], anos * indicadores),
+        "value": rng.lognormal(3, 1, linhas),
+        "ano": np.repeat(np.tile(np.arange(2015, 2015 + anos), indicadores), municipios),
+        "data_name": np.repeat([f"Indicador {i}" for i in range(indicadores)], municipios * anos),
+    })
+    recortes = pd.DataFrame({
+        "codigo_ibge": codigos,
+        "região": np.array(["Norte", "Nordeste", "Sudeste", "Sul", "Centro-Oeste"])[codigos % 5],
+        "tipologia": np.array(["Alta renda", "Média renda", "Baixa renda"])[codigos % 3],
+        "participacao_semiarido": np.where(codigos % 4 == 0, "Sim", "Não"),
+    }).set_index("codigo_ibge")
+    return df, recortes
+
+
+def medir(funcao):
+    inicio = time.perf_counter()
+    texto = funcao()
+    return texto, (time.perf_counter() - inicio) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--municipios", type=int, default=5570)
+    parser.add_argument("--anos", type=int, default=8)
+    parser.add_argument("--indicadores", type=int, default=1)
+    args = parser.parse_args()
+
+    df, recortes = resultado_sintetico(args.municipios, args.anos, args.indicadores)
+    print(f"{len(df)} linhas")
+    for nome, funcao in (
+        ("linhas completas", lambda: f"Analise os seguintes dados {df.to_json(orient='records')}"),
+        ("resumo", lambda: preparar_payload(df, recortes)),
+    ):
+        texto, ms = medir(funcao)
+        print(f"{nome:18s} {len(texto.encode('utf-8')) / 1024:10.1f} KiB  "
+              f"~{estimar_tokens(texto):9d} tokens  {ms:8.1f} ms")
@@ -0,0 +1,219 @@
+"""Teste de carga offline do pipeline de consulta, com LLMs e IBGE substituídos.
+
+Gera (uma vez) um `dados_reduzido.db` sintético e a malha municipal num
+diretório de trabalho, troca OpenAI, Gemini e o download do IBGE pelos
+substitutos de `benchmarks/substitutos.py` e reproduz as perguntas do corpus
+pelas mesmas funções que `main()` chama em `app.py`, com concorrência
+configurável. Relata vazão, percentis por consulta e por etapa (a partir dos
+spans de `instrumentacao.py`) e o pico de memória (RSS).
+
+Com `--saida` o relatório é gravado em JSON; com `--comparar`, é confrontado
+com um relatório anterior e o processo termina com erro se alguma latência
+piorar além da tolerância.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.carga --concorrencia 4 --repeticoes 3 --saida carga.json
+    python -m benchmarks.carga --concorrencia 4 --repeticoes 3 --comparar carga.json
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import malha
+from benchmarks.dados_sinteticos import criar_banco
+from benchmarks.substitutos import GeminiSubstituto, OpenAISubstituto, baixar_malha_substituta
+from instrumentacao import percentil
+from pipeline import AnaliseEmSegundoPlano
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS = os.path.join(os.path.dirname(__file__), "corpus_planejador.json")
+
+# Arquivos de cache apagados a cada execução, para medições comparáveis
+CACHES = ("data/cache_sql.sqlite", "data/cache_resultados", "data/spans.sqlite")
+
+# Diferenças abaixo deste valor (s) não contam como regressão
+RUIDO = 0.02
+
+
+def preparar_diretorio(diretorio, args):
+    """Cria banco e malha sintéticos, se ainda não existirem, e limpa os caches."""
+    os.makedirs(os.path.join(diretorio, "data"), exist_ok=True)
+    banco = os.path.join(diretorio, "data", "dados_reduzido.db")
+    if not os.path.exists(banco):
+        inicio = time.perf_counter()
+        criar_banco(banco, args.municipios, args.indicadores, range(2015, 2015 + args.anos))
+        print(f"banco sintético criado em {time.perf_counter() - inicio:.1f} s")
+    destino = os.path.join(diretorio, "data", "malha")
+    if not os.path.exists(os.path.join(destino, "indice.json")):
+        inicio = time.perf_counter()
+        malha.baixar_malha_ibge = baixar_malha_substituta(args.latencia_ibge, args.municipios)
+        malha.construir_malha(malha.baixar_malha_ibge(), destino)
+        print(f"malha sintética criada em {time.perf_counter() - inicio:.1f} s")
+    for estatico in ("PNDR.png", "data/indicadores_pndr.csv"):
+        if not os.path.exists(os.path.join(diretorio, estatico)):
+            shutil.copy(os.path.join(RAIZ, estatico), os.path.join(diretorio, estatico))
+    for cache in CACHES:
+        caminho = os.path.join(diretorio, cache)
+        if os.path.isdir(caminho):
+            shutil.rmtree(caminho)
+        elif os.path.exists(caminho):
+            os.remove(caminho)
+
+
+def importar_app(args, corpus):
+    """Importa `app.py` com os clientes de LLM substituídos."""
+    import google.genai
+    import openai
+
+    respostas = {c["pergunta"]: c["sql_llm"] for c in corpus if c.get("sql_llm")}
+    openai.OpenAI = OpenAISubstituto(args.latencia_openai, respostas)
+    google.genai.Client = GeminiSubstituto(args.primeiro_trecho, args.trechos, args.intervalo)
+    import app
+    return app
+
+
+def consultar(app, pergunta):
+    """Os passos de `main()` para uma pergunta; devolve a duração em segundos."""
+    inicio = time.perf_counter()
+    sql = app.gerar_sql(pergunta)
+    tabela = app.fetch_data(sql)
+    cache_resultados = app.get_cache_resultados()
+    insights = cache_resultados.obter_analise(sql)
+    analise = None
+    if insights is None:
+        recortes, cubo, cliente = app.get_recortes(), app.get_cubo(), app.get_cliente_gemini()
+        analise = AnaliseEmSegundoPlano(lambda: app.analyze_data_stream(tabela, recortes, cubo, cliente))
+    app.show_table(tabela)
+    app.plot_data(tabela)
+    app.create_map(tabela)
+    if analise is not None:
+        cache_resultados.guardar_analise(sql, analise.texto())
+    return time.perf_counter() - inicio
+
+
+def percentis(duracoes):
+    duracoes = sorted(duracoes)
+    return {"n": len(duracoes), "p50": percentil(duracoes, 50),
+            "p90": percentil(duracoes, 90), "p99": percentil(duracoes, 99)}
+
+
+def comparar(relatorio, anterior, tolerancia):
+    """Lista as latências que pioraram mais que `tolerancia` (fração) em relação ao anterior."""
+    regressoes = []
+    pares = [("consulta", relatorio["consulta"], anterior["consulta"])]
+    pares += [(etapa, valores, anterior["etapas"][etapa])
+              for etapa, valores in relatorio["etapas"].items() if etapa in anterior["etapas"]]
+    for nome, novo, antigo in pares:
+        for p in ("p50", "p90"):
+            if novo[p] > antigo[p] * (1 + tolerancia) and novo[p] - antigo[p] > RUIDO:
+                regressoes.append(f"{nome} {p}: {antigo[p]:.3f} s -> {novo[p]:.3f} s")
+    if relatorio["pico_rss_mib"] > anterior["pico_rss_mib"] * (1 + tolerancia):
+        regressoes.append(f"pico de RSS: {anterior['pico_rss_mib']:.0f} MiB -> "
+                          f"{relatorio['pico_rss_mib']:.0f} MiB")
+    return regressoes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--diretorio", help="diretório de trabalho reaproveitado entre execuções "
+                                            "(padrão: temporário)")
+    parser.add_argument("--corpus", default=CORPUS, help="JSON com `pergunta` e, opcional, `sql_llm`")
+    parser.add_argument("--concorrencia", type=int, default=4)
+    parser.add_argument("--repeticoes", type=int, default=2, help="passadas pelo corpus")
+    parser.add_argument("--municipios", type=int, default=5570)
+    parser.add_argument("--indicadores", type=int, default=50)
+    parser.add_argument("--anos", type=int, default=8)
+    parser.add_argument("--latencia-openai", type=float, default=1.5, help="segundos por SQL gerado")
+    parser.add_argument("--primeiro-trecho", type=float, default=2.0, help="segundos até o 1º trecho")
+    parser.add_argument("--trechos", type=int, default=20)
+    parser.add_argument("--intervalo", type=float, default=0.05, help="segundos entre trechos")
+    parser.add_argument("--latencia-ibge", type=float, default=0.0, help="segundos do download da malha")
+    parser.add_argument("--saida", help="grava o relatório em JSON")
+    parser.add_argument("--comparar", help="relatório JSON anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.25)
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as arquivo:
+        corpus = json.load(arquivo)
+    saida = os.path.abspath(args.saida) if args.saida else None
+    comparacao = os.path.abspath(args.comparar) if args.comparar else None
+
+    diretorio = os.path.abspath(args.diretorio or tempfile.mkdtemp(prefix="pndr_carga_"))
+    # Num processo à parte, para que a geração dos dados não entre no pico de RSS
+    preparo = multiprocessing.get_context("spawn").Process(target=preparar_diretorio, args=(diretorio, args))
+    preparo.start()
+    preparo.join()
+    if preparo.exitcode != 0:
+        sys.exit("falha ao preparar o diretório de trabalho")
+    # O aplicativo usa caminhos relativos a data/; os módulos continuam vindo da raiz
+    sys.path.insert(0, RAIZ)
+    os.chdir(diretorio)
+
+    # Fora do `streamlit run`, cada chamada a `st.*` emite um aviso; só erros são exibidos
+    logging.disable(logging.WARNING)
+    inicio = time.perf_counter()
+    app = importar_app(args, corpus)
+    app.get_planejador()
+    app.get_recortes()
+    partida = time.perf_counter() - inicio
+
+    perguntas = [c["pergunta"] for c in corpus] * args.repeticoes
+    duracoes, erros = [], []
+
+    def executar(pergunta):
+        try:
+            duracoes.append(consultar(app, pergunta))
+        except Exception as erro:
+            erros.append(f"{pergunta}: {type(erro).__name__}: {erro}")
+
+    marco = time.time()
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concorrencia) as executor:
+        list(executor.map(executar, perguntas))
+    total = time.perf_counter() - inicio
+
+    etapas = {e["etapa"]: {k: e[k] for k in ("n", "p50", "p90", "p99")}
+              for e in app.registro_spans.percentis(marco)}
+    relatorio = {
+        "consultas": len(perguntas),
+        "erros": len(erros),
+        "concorrencia": args.concorrencia,
+        "partida_s": partida,
+        "duracao_s": total,
+        "vazao_por_min": 60 * len(duracoes) / total,
+        "consulta": percentis(duracoes),
+        "etapas": etapas,
+        "pico_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+    print(f"{len(perguntas)} consultas ({len(erros)} erros), concorrência {args.concorrencia}, "
+          f"partida {partida:.2f} s")
+    print(f"vazão {relatorio['vazao_por_min']:.1f} consultas/min, pico de RSS "
+          f"{relatorio['pico_rss_mib']:.0f} MiB")
+    print(f"{'etapa':18s} {'n':>5s} {'p50':>8s} {'p90':>8s} {'p99':>8s}")
+    linhas = sorted(etapas.items())
+    if duracoes:
+        linhas.insert(0, ("consulta", relatorio["consulta"]))
+    for nome, valores in linhas:
+        print(f"{nome:18s} {valores['n']:5d} " + " ".join(f"{valores[p]:7.3f}s" for p in ("p50", "p90", "p99")))
+    for erro in erros[:10]:
+        print(f"  erro: {erro}")
+
+    if saida:
+        with open(saida, "w", encoding="utf-8") as arquivo:
+            json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+    if comparacao:
+        with open(comparacao, encoding="utf-8") as arquivo:
+            regressoes = comparar(relatorio, json.load(arquivo), args.tolerancia)
+        for regressao in regressoes:
+            print(f"REGRESSÃO {regressao}")
+        sys.exit(1 if regressoes or erros else 0)
+    sys.exit(1 if erros else 0)
@@ -0,0 +1,158 @@
+"""Dados sintéticos para os benchmarks, sem acesso à rede."""
+import math
+import random
+
+import duckdb
+import pandas as pd
+
+from cubo import construir_cubo
+from preparar_banco import preparar_banco
+
+# Códigos IBGE das 27 UFs
+UFS = (
+    "11", "12", "13", "14", "15", "16", "17",
+    "21", "22", "23", "24", "25", "26", "27", "28", "29",
+    "31", "32", "33", "35",
+    "41", "42", "43",
+    "50", "51", "52", "53",
+)
+
+# Nome e região de cada UF, como na tabela recortes_geograficos
+ESTADOS = {
+    "11": ("Rondônia", "Norte"), "12": ("Acre", "Norte"), "13": ("Amazonas", "Norte"),
+    "14": ("Roraima", "Norte"), "15": ("Pará", "Norte"), "16": ("Amapá", "Norte"),
+    "17": ("Tocantins", "Norte"),
+    "21": ("Maranhão", "Nordeste"), "22": ("Piauí", "Nordeste"), "23": ("Ceará", "Nordeste"),
+    "24": ("Rio Grande do Norte", "Nordeste"), "25": ("Paraíba", "Nordeste"),
+    "26": ("Pernambuco", "Nordeste"), "27": ("Alagoas", "Nordeste"), "28": ("Sergipe", "Nordeste"),
+    "29": ("Bahia", "Nordeste"),
+    "31": ("Minas Gerais", "Sudeste"), "32": ("Espírito Santo", "Sudeste"),
+    "33": ("Rio de Janeiro", "Sudeste"), "35": ("São Paulo", "Sudeste"),
+    "41": ("Paraná", "Sul"), "42": ("Santa Catarina", "Sul"), "43": ("Rio Grande do Sul", "Sul"),
+    "50": ("Mato Grosso do Sul", "Centro-Oeste"), "51": ("Mato Grosso", "Centro-Oeste"),
+    "52": ("Goiás", "Centro-Oeste"), "53": ("Distrito Federal", "Centro-Oeste"),
+}
+
+# Indicadores citados nos exemplos do aplicativo; os demais são numerados
+INDICADORES = (
+    "Sustentabilidade Fiscal dos Municípios",
+    "Desmatamento",
+    "Desnutrição",
+    "Distorção Idade-Série",
+    "Coeficiente de Diversificação Econômica",
+    "Índice de Centralidade",
+    "Diferencial Salarial Médio Feminino",
+    "Taxa de Variação Populacional",
+    "População",
+)
+TIPOLOGIAS = ("Alta Renda", "Média Renda", "Baixa Renda")
+
+
+def codigos_municipios(total=5570):
+    """Códigos de 7 dígitos distribuídos entre as UFs, como os do IBGE."""
+    codigos = []
+    for i in range(total):
+        uf = UFS[i % len(UFS)]
+        codigos.append(f"{uf}{i // len(UFS) + 1:04d}0")
+    return codigos
+
+
+def _centro(i, codarea):
+    """Centro do polígono sintético do município, numa grade por UF."""
+    uf = UFS.index(codarea[:2])
+    cx = -70 + (uf % 9) * 4 + (i // len(UFS)) % 20 * 0.2
+    cy = -30 + (uf // 9) * 10 + (i // len(UFS)) // 20 * 0.2
+    return cx, cy
+
+
+def malha_sintetica(total=5570, vertices=300, semente=0):
+    """GeoJSON no formato da malha do IBGE, com polígonos irregulares por município."""
+    aleatorio = random.Random(semente)
+    features = []
+    for i, codarea in enumerate(codigos_municipios(total)):
+        # Cada UF ocupa uma célula de uma grade sobre o território
+        cx, cy = _centro(i, codarea)
+        raio = 0.09
+        anel = []
+        for k in range(vertices):
+            angulo = 2 * math.pi * k / vertices
+            r = raio * (0.8 + 0.2 * aleatorio.random())
+            anel.append([cx + r * math.cos(angulo), cy + r * math.sin(angulo)])
+        anel.append(anel[0])
+        features.append({
+            "type": "Feature",
+            "properties": {"codarea": codarea},
+            "geometry": {"type": "Polygon", "coordinates": [anel]},
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def recortes_sinteticos(total=5570, semente=0):
+    """Tabela recortes_geograficos com os mesmos municípios e centros da malha sintética."""
+    aleatorio = random.Random(semente)
+    linhas = []
+    for i, codarea in enumerate(codigos_municipios(total)):
+        estado, regiao = ESTADOS[codarea[:2]]
+        cx, cy = _centro(i, codarea)
+        nordeste = regiao == "Nordeste"
+        # Regiões imediatas de 10 municípios; a primeira do Paraná é Toledo
+        imediata = f"{codarea[:2]}{(i // len(UFS)) // 10:03d}"
+        linhas.append({
+            "codigo_ibge": int(codarea),
+            "município": f"Município {codarea}",
+            "estado": estado,
+            "região": regiao,
+            "faixa_de_fronteira": int(aleatorio.random() < 0.1),
+            "participacao_semiarido": "Sim" if nordeste and aleatorio.random() < 0.6 else "Não",
+            "regiao_intermediaria": f"Intermediária {codarea[:2]}{(i // len(UFS)) // 40:02d}",
+            "tipologia": aleatorio.choice(TIPOLOGIAS),
+            "participacao_sudene": "Sim" if nordeste else "Não",
+            "regiao_imediata": "Toledo" if imediata == "41000" else f"Imediata {imediata}",
+            "participacao_amazonia_legal": "Sim" if regiao == "Norte" else "Não",
+            "longitude": cx,
+            "latitude": cy,
+            "geometry": "POLYGON EMPTY",
+        })
+    return pd.DataFrame(linhas)
+
+
+def criar_banco(caminho, municipios=5570, indicadores=50, anos=range(2015, 2023), semente=0):
+    """Gera um `dados_reduzido.db` sintético, já preparado por `preparar_banco` e com o cubo.
+
+    São `municipios` × `indicadores` × `anos` linhas em `valoresmeta`, com
+    valores pseudoaleatórios determinísticos e ~2% de ausências.
+    """
+    nomes = list(INDICADORES[:indicadores])
+    nomes += [f"Indicador Sintético {n}" for n in range(len(nomes) + 1, indicadores + 1)]
+    anos = list(anos)
+
+    conn = duckdb.connect(caminho)
+    conn.execute("SET enable_progress_bar = false")
+    conn.execute(f"SELECT setseed({semente / 1000})")
+    recortes = recortes_sinteticos(municipios, semente)
+    conn.register("recortes_df", recortes)
+    conn.execute("CREATE OR REPLACE TABLE recortes_geograficos AS SELECT * FROM recortes_df")
+    conn.unregister("recortes_df")
+
+    conn.register("nomes_df", pd.DataFrame({"i": range(len(nomes)), "data_name": nomes}))
+    conn.execute(f"""
+        CREATE OR REPLACE TABLE valoresmeta AS
+        SELECT
+            (n.i * 1000 + a.ano - {anos[0]})::BIGINT AS mdata_id,
+            r.codigo_ibge AS geoloc_id,
+            r.codigo_ibge AS local_id,
+            make_timestamp(a.ano, 1, 1, 0, 0, 0) AS refdate,
+            CASE WHEN random() < 0.02 THEN NULL
+                 ELSE round(n.i * 10 + (a.ano - {anos[0]}) + random() * 100, 4) END AS value,
+            n.data_name AS orig_name,
+            n.data_name,
+            r."município" AS local_name
+        FROM nomes_df AS n
+        CROSS JOIN (SELECT UNNEST({anos}) AS ano) AS a
+        CROSS JOIN recortes_geograficos AS r
+        ORDER BY a.ano, n.i, r.codigo_ibge
+    """)
+    conn.unregister("nomes_df")
+    preparar_banco(conn)
+    construir_cubo(conn)
+    conn.close()
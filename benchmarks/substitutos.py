@@ -0,0 +1,99 @@
+"""Substitutos locais e determinísticos de OpenAI, Gemini e da API do IBGE.
+
+Imitam apenas a parte dos clientes usada pelo aplicativo, com latência
+configurável, para medir o pipeline sem rede e sem custo de tokens.
+"""
+import time
+import zlib
+from types import SimpleNamespace
+
+from benchmarks.dados_sinteticos import INDICADORES, malha_sintetica
+
+# SQL devolvido pela LLM substituta quando a pergunta não tem resposta própria
+SQL_PADRAO = """SELECT
+    r.codigo_ibge,
+    r.município,
+    r.estado,
+    v.value,
+    v.ano,
+    v.data_name
+FROM
+    valoresmeta_latest AS v
+LEFT JOIN
+    recortes_geograficos AS r ON r.codigo_ibge = v.geoloc_id
+WHERE
+    v.data_name LIKE '%{indicador}%'"""
+
+
+def _tokens(texto):
+    return max(1, len(texto) // 4)
+
+
+class OpenAISubstituto:
+    """Faz o papel de `OpenAI()`: `chat.completions.create` devolve SQL após `latencia` s.
+
+    `respostas` associa perguntas a SQL; as demais recebem `SQL_PADRAO` com um
+    indicador escolhido pelo hash da pergunta.
+    """
+
+    def __init__(self, latencia=1.5, respostas=None):
+        self.latencia = latencia
+        self.respostas = respostas or {}
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._criar))
+
+    def __call__(self, *args, **kwargs):
+        # O aplicativo cria o cliente uma vez (`get_cliente_openai`); a instância é este objeto
+        return self
+
+    def _criar(self, model, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        pergunta = prompt.split("Pergunta:", 1)[-1].split("\n", 1)[0].strip()
+        sql = self.respostas.get(pergunta)
+        if sql is None:
+            indicador = INDICADORES[zlib.crc32(pergunta.encode("utf-8")) % len(INDICADORES)]
+            sql = SQL_PADRAO.format(indicador=indicador)
+        time.sleep(self.latencia)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=sql))],
+            usage=SimpleNamespace(prompt_tokens=_tokens(prompt), completion_tokens=_tokens(sql)),
+        )
+
+
+class GeminiSubstituto:
+    """Faz o papel de `genai.Client`: `models.generate_content_stream` devolve trechos de texto.
+
+    O primeiro trecho chega após `primeiro_trecho` s e os demais a cada `intervalo` s.
+    """
+
+    def __init__(self, primeiro_trecho=2.0, trechos=20, intervalo=0.05):
+        self.primeiro_trecho = primeiro_trecho
+        self.trechos = trechos
+        self.intervalo = intervalo
+        self.models = SimpleNamespace(generate_content_stream=self._gerar)
+
+    def __call__(self, *args, **kwargs):
+        # Criado uma vez por `get_cliente_gemini`; a instância é este objeto
+        return self
+
+    def _gerar(self, model, contents, config=None):
+        entrada = _tokens(contents)
+        time.sleep(self.primeiro_trecho)
+        for i in range(self.trechos):
+            ultimo = i == self.trechos - 1
+            texto = f"Trecho {i + 1} da análise de um payload de {len(contents)} caracteres. "
+            yield SimpleNamespace(
+                text=texto,
+                usage_metadata=SimpleNamespace(prompt_token_count=entrada,
+                                               candidates_token_count=_tokens(texto) * self.trechos)
+                if ultimo else None,
+            )
+            if not ultimo:
+                time.sleep(self.intervalo)
+
+
+def baixar_malha_substituta(latencia=0.0, municipios=5570):
+    """Faz o papel de `malha.baixar_malha_ibge`, com a malha sintética."""
+    def baixar(url=None):
+        time.sleep(latencia)
+        return malha_sintetica(municipios)
+    return baixar
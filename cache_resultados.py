@@ -0,0 +1,177 @@
+"""Cache de resultados por SQL: tabelas (Parquet) e textos de análise.
+
+A chave combina o SQL normalizado com a impressão digital do arquivo do banco
+(mtime e tamanho), de modo que substituir `dados_reduzido.db` invalida tudo
+automaticamente. Há um nível em memória e um nível em disco, ambos com limite
+de tamanho em bytes, que descartam primeiro as entradas usadas há mais tempo.
+Resultados maiores que o limite da memória ficam só no disco.
+"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from banco import CAMINHO_BANCO, impressao_banco
+
+DIRETORIO_CACHE = "data/cache_resultados"
+
+
+def normalizar_sql(sql):
+    """Compacta espaços fora de literais e remove o ';' final; literais ficam intactos."""
+    partes = re.split(r"('(?:[^']|'')*')", sql.strip().rstrip(";").strip())
+    return "".join(p if i % 2 else re.sub(r"\s+", " ", p) for i, p in enumerate(partes)).strip()
+
+
+class CacheResultados:
+    """Cache em dois níveis para resultados de `fetch_data` e `analyze_data`."""
+
+    def __init__(self, caminho_banco=CAMINHO_BANCO, diretorio=DIRETORIO_CACHE,
+                 max_bytes_memoria=256 * 1024 ** 2, max_bytes_disco=512 * 1024 ** 2):
+        self.caminho_banco = caminho_banco
+        self.diretorio = diretorio
+        self.max_bytes_memoria = max_bytes_memoria
+        self.max_bytes_disco = max_bytes_disco
+        self._memoria = OrderedDict()
+        self._bytes_memoria = 0
+        self._impressao = None
+        self._trava = threading.Lock()
+        self.estatisticas = {"memoria": 0, "disco": 0, "falhas": 0, "gravacoes": 0}
+
+    #######################
+    # Chaves e invalidação
+
+    def _verificar_banco(self):
+        """Descarta o cache inteiro quando o arquivo do banco muda."""
+        impressao = impressao_banco(self.caminho_banco)
+        if impressao != self._impressao:
+            self._memoria.clear()
+            self._bytes_memoria = 0
+            if os.path.isdir(self.diretorio):
+                for nome in os.listdir(self.diretorio):
+                    if nome != impressao:
+                        shutil.rmtree(os.path.join(self.diretorio, nome), ignore_errors=True)
+            os.makedirs(os.path.join(self.diretorio, impressao), exist_ok=True)
+            self._impressao = impressao
+        return impressao
+
+    def _caminho(self, chave, extensao):
+        return os.path.join(self.diretorio, self._impressao, f"{chave}.{extensao}")
+
+    def chave(self, sql):
+        impressao = self._verificar_banco()
+        return hashlib.sha256(f"{impressao}\n{normalizar_sql(sql)}".encode("utf-8")).hexdigest()
+
+    #######################
+    # Níveis
+
+    def _obter(self, sql, tipo, extensao, ler):
+        with self._trava:
+            chave = (self.chave(sql), tipo)
+            if chave in self._memoria:
+                self._memoria.move_to_end(chave)
+                self.estatisticas["memoria"] += 1
+                return self._memoria[chave][0]
+            caminho = self._caminho(chave[0], extensao)
+            if os.path.exists(caminho):
+                try:
+                    valor = ler(caminho)
+                    os.utime(caminho)
+                except (OSError, ValueError):
+                    # Arquivo truncado ou removido por outro processo: conta como falha
+                    try:
+                        os.remove(caminho)
+                    except FileNotFoundError:
+                        pass
+                else:
+                    self._lembrar(chave, valor)
+                    self.estatisticas["disco"] += 1
+                    return valor
+            self.estatisticas["falhas"] += 1
+            return None
+
+    def _guardar(self, sql, tipo, extensao, valor, gravar):
+        with self._trava:
+            chave = (self.chave(sql), tipo)
+            self._lembrar(chave, valor)
+            # Grava num temporário da mesma pasta e o move para o lugar: leitores de outras
+            # sessões ou processos nunca veem um arquivo pela metade
+            caminho = self._caminho(chave[0], extensao)
+            descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix=".tmp")
+            os.close(descritor)
+            try:
+                gravar(valor, temporario)
+                os.replace(temporario, caminho)
+            except BaseException:
+                os.remove(temporario)
+                raise
+            self.estatisticas["gravacoes"] += 1
+            self._limitar_disco()
+
+    def _lembrar(self, chave, valor):
+        tamanho = valor.nbytes if isinstance(valor, pa.Table) else len(valor.encode("utf-8"))
+        if chave in self._memoria:
+            self._bytes_memoria -= self._memoria.pop(chave)[1]
+        if tamanho > self.max_bytes_memoria:
+            return
+        self._memoria[chave] = (valor, tamanho)
+        self._bytes_memoria += tamanho
+        while self._bytes_memoria > self.max_bytes_memoria:
+            self._bytes_memoria -= self._memoria.popitem(last=False)[1][1]
+
+    def _limitar_disco(self):
+        pasta = os.path.join(self.diretorio, self._impressao)
+        arquivos = []
+        for nome in os.listdir(pasta):
+            # Temporários são gravações em andamento de outros processos
+            if nome.endswith(".tmp"):
+                continue
+            try:
+                estado = os.stat(os.path.join(pasta, nome))
+            except FileNotFoundError:
+                continue
+            arquivos.append((estado.st_mtime, estado.st_size, os.path.join(pasta, nome)))
+        arquivos.sort()
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        for _, tamanho, arquivo in arquivos:
+            if total <= self.max_bytes_disco:
+                break
+            try:
+                os.remove(arquivo)
+            except FileNotFoundError:
+                pass
+            total -= tamanho
+
+    #######################
+    # Interface
+
+    def obter_tabela(self, sql):
+        """Tabela Arrow em cache para o SQL, ou None."""
+        return self._obter(sql, "tabela", "parquet", pq.read_table)
+
+    def guardar_tabela(self, sql, tabela):
+        if not isinstance(tabela, pa.Table):
+            tabela = pa.Table.from_pandas(tabela, preserve_index=False)
+        self._guardar(sql, "tabela", "parquet", tabela, pq.write_table)
+
+    def obter_analise(self, sql):
+        def ler(caminho):
+            with open(caminho, encoding="utf-8") as arquivo:
+                return arquivo.read()
+        return self._obter(sql, "analise", "txt", ler)
+
+    def guardar_analise(self, sql, texto):
+        def gravar(valor, caminho):
+            with open(caminho, "w", encoding="utf-8") as arquivo:
+                arquivo.write(valor)
+        self._guardar(sql, "analise", "txt", texto, gravar)
+
+    def taxa_acerto(self):
+        acertos = self.estatisticas["memoria"] + self.estatisticas["disco"]
+        total = acertos + self.estatisticas["falhas"]
+        return acertos / total if total else 0.0
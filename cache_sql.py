@@ -0,0 +1,169 @@
+"""Cache persistente pergunta -> SQL em dois níveis.
+
+1. Igualdade exata da pergunta normalizada (sem acentos, caixa e espaços extras).
+2. Perguntas quase idênticas, por similaridade TF-IDF de trigramas de caracteres,
+   desde que citem os mesmos números e, quando informadas, as mesmas entidades
+   do catálogo (indicador, recortes e ordenação; ver `Planejador.entidades`).
+
+As entradas ficam num SQLite local e expiram por TTL; acima do limite de
+entradas, as menos usadas recentemente são descartadas. Antes de ser
+reaproveitado, o SQL é revalidado contra o schema do DuckDB.
+"""
+import math
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import Counter
+
+CAMINHO_CACHE = "data/cache_sql.sqlite"
+
+
+def normalizar_pergunta(pergunta):
+    """Remove acentos, pontuação final, caixa e espaços repetidos."""
+    texto = unicodedata.normalize("NFKD", pergunta)
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r"\s+", " ", texto.lower()).strip()
+    return texto.rstrip("?.! ")
+
+
+def _trigramas(texto):
+    texto = f" {texto} "
+    return Counter(texto[i:i + 3] for i in range(len(texto) - 2))
+
+
+def _numeros(texto):
+    """Anos e demais números precisam coincidir para a pergunta ser considerada igual."""
+    return sorted(re.findall(r"\d+", texto))
+
+
+class CacheSQL:
+    """Cache pergunta -> SQL com nível exato e nível por similaridade."""
+
+    def __init__(self, caminho=CAMINHO_CACHE, limiar=0.9, ttl=7 * 24 * 3600, max_entradas=1000):
+        self.limiar = limiar
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._trava = threading.Lock()
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS cache_sql (
+                   pergunta TEXT PRIMARY KEY,
+                   sql TEXT NOT NULL,
+                   latencia REAL NOT NULL,
+                   criado REAL NOT NULL,
+                   usado REAL NOT NULL
+               )"""
+        )
+        self._conn.commit()
+        self._indice = None
+        self.estatisticas = {"consultas": 0, "exatos": 0, "similares": 0, "tempo_economizado": 0.0}
+
+    #######################
+    # Índice de similaridade
+
+    def _construir_indice(self):
+        linhas = self._conn.execute("SELECT pergunta FROM cache_sql").fetchall()
+        documentos = {p: _trigramas(p) for (p,) in linhas}
+        frequencia = Counter(t for tri in documentos.values() for t in tri)
+        n = len(documentos)
+        idf = {t: math.log((1 + n) / (1 + f)) + 1 for t, f in frequencia.items()}
+        vetores = {p: self._vetor(tri, idf) for p, tri in documentos.items()}
+        self._indice = (idf, vetores)
+
+    @staticmethod
+    def _vetor(trigramas, idf):
+        vetor = {t: c * idf.get(t, 1.0) for t, c in trigramas.items()}
+        norma = math.sqrt(sum(v * v for v in vetor.values())) or 1.0
+        return {t: v / norma for t, v in vetor.items()}
+
+    def _mais_similar(self, pergunta, entidades=None):
+        if self._indice is None:
+            self._construir_indice()
+        idf, vetores = self._indice
+        consulta = self._vetor(_trigramas(pergunta), idf)
+        candidatas = []
+        for candidata, vetor in vetores.items():
+            if _numeros(candidata) != _numeros(pergunta):
+                continue
+            s = sum(peso * vetor.get(t, 0.0) for t, peso in consulta.items())
+            if s >= self.limiar:
+                candidatas.append((s, candidata))
+        # As entidades só são extraídas das poucas candidatas acima do limiar
+        procuradas = entidades(pergunta) if entidades is not None and candidatas else None
+        for _, candidata in sorted(candidatas, reverse=True):
+            if procuradas is None or entidades(candidata) == procuradas:
+                return candidata
+        return None
+
+    #######################
+    # Leitura e escrita
+
+    def buscar(self, pergunta, validar=None, entidades=None):
+        """Devolve o SQL em cache para a pergunta, ou None.
+
+        `validar(sql) -> bool` é chamado antes do reaproveitamento; entradas
+        inválidas são removidas. `entidades(pergunta) -> frozenset` restringe o
+        nível por similaridade a perguntas com as mesmas entidades.
+        """
+        chave = normalizar_pergunta(pergunta)
+        agora = time.time()
+        with self._trava:
+            self.estatisticas["consultas"] += 1
+            # Confirma a expiração já, para não manter o SQLite travado durante a chamada à LLM
+            expiradas = self._conn.execute("DELETE FROM cache_sql WHERE criado < ?", (agora - self.ttl,)).rowcount
+            self._conn.commit()
+            if expiradas:
+                self._indice = None
+            linha = self._conn.execute(
+                "SELECT pergunta, sql, latencia FROM cache_sql WHERE pergunta = ?", (chave,)
+            ).fetchone()
+            nivel = "exatos"
+            if linha is None:
+                similar = self._mais_similar(chave, entidades)
+                if similar is not None:
+                    linha = self._conn.execute(
+                        "SELECT pergunta, sql, latencia FROM cache_sql WHERE pergunta = ?", (similar,)
+                    ).fetchone()
+                    nivel = "similares"
+            if linha is None:
+                return None
+
+            encontrada, sql, latencia = linha
+            if validar is not None and not validar(sql):
+                self._conn.execute("DELETE FROM cache_sql WHERE pergunta = ?", (encontrada,))
+                self._conn.commit()
+                self._indice = None
+                return None
+
+            self._conn.execute("UPDATE cache_sql SET usado = ? WHERE pergunta = ?", (agora, encontrada))
+            self._conn.commit()
+            self.estatisticas[nivel] += 1
+            self.estatisticas["tempo_economizado"] += latencia
+            return sql
+
+    def gravar(self, pergunta, sql, latencia):
+        """Guarda o SQL gerado e quanto tempo a LLM levou para gerá-lo."""
+        chave = normalizar_pergunta(pergunta)
+        agora = time.time()
+        with self._trava:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_sql VALUES (?, ?, ?, ?, ?)",
+                (chave, sql, latencia, agora, agora),
+            )
+            # Descarta as entradas menos usadas recentemente acima do limite
+            self._conn.execute(
+                """DELETE FROM cache_sql WHERE pergunta IN (
+                       SELECT pergunta FROM cache_sql ORDER BY usado DESC LIMIT -1 OFFSET ?
+                   )""",
+                (self.max_entradas,),
+            )
+            self._conn.commit()
+            self._indice = None
+
+    def taxa_acerto(self):
+        consultas = self.estatisticas["consultas"]
+        if not consultas:
+            return 0.0
+        return (self.estatisticas["exatos"] + self.estatisticas["similares"]) / consultas
@@ -0,0 +1,214 @@
+"""Cubo de agregados por recorte geográfico, calculado offline.
+
+Para cada indicador, ano e recorte (UF, região, tipologia, semiárido, Sudene,
+Amazônia Legal, faixa de fronteira e o total do Brasil), a tabela
+`cubo_recortes` guarda o número de municípios, média, mediana, quantis,
+mínimo, máximo e a média ponderada pela população. Perguntas agregadas
+("média por estado", "semiárido e demais municípios") e as referências da
+análise por IA são respondidas lendo poucas linhas, sem varrer `valoresmeta`.
+
+Gerado com `python cubo.py` depois de `preparar_banco.py`. A cada nova carga,
+só os pares (indicador, ano) ausentes do cubo são calculados; `--completo`
+recalcula tudo (necessário quando valores de anos antigos ou os recortes mudam).
+"""
+import argparse
+import os
+import threading
+import time
+
+import duckdb
+
+from banco import CAMINHO_BANCO
+
+TABELA_CUBO = "cubo_recortes"
+
+# Recortes do cubo, além do total "brasil"
+RECORTES_CUBO = (
+    "estado",
+    "região",
+    "tipologia",
+    "participacao_semiarido",
+    "participacao_sudene",
+    "participacao_amazonia_legal",
+    "faixa_de_fronteira",
+)
+
+# Recortes enviados como referência à análise por IA (os 27 estados ficam de fora)
+RECORTES_REFERENCIA = ("brasil",) + tuple(r for r in RECORTES_CUBO if r != "estado")
+
+# Indicador usado como peso da média ponderada; sem ele, media_ponderada fica nula
+INDICADOR_POPULACAO = os.environ.get("PNDR_INDICADOR_POPULACAO", "População")
+
+
+def _aspas(valor):
+    return valor.replace("'", "''")
+
+
+def _arredondar(valor):
+    return None if valor is None else round(float(valor), 4)
+
+
+def construir_cubo(conn, completo=False, populacao=INDICADOR_POPULACAO):
+    """Calcula no cubo os pares (indicador, ano) de `valoresmeta` que ainda não estão nele.
+
+    Devolve o número de pares calculados. A média ponderada usa a população do
+    município no mesmo ano ou, na falta dela, a do ano anterior mais próximo.
+    """
+    conn.execute("BEGIN TRANSACTION")
+    if completo:
+        conn.execute(f"DROP TABLE IF EXISTS {TABELA_CUBO}")
+    conn.execute(
+        f"""CREATE TABLE IF NOT EXISTS {TABELA_CUBO} (
+                data_name VARCHAR,
+                ano INTEGER,
+                recorte VARCHAR,
+                valor VARCHAR,
+                n BIGINT,
+                media DOUBLE,
+                mediana DOUBLE,
+                p10 DOUBLE,
+                p25 DOUBLE,
+                p75 DOUBLE,
+                p90 DOUBLE,
+                minimo DOUBLE,
+                maximo DOUBLE,
+                media_ponderada DOUBLE,
+                populacao DOUBLE
+            )"""
+    )
+    conn.execute(
+        f"""CREATE OR REPLACE TEMP TABLE cubo_pendentes AS
+            SELECT DISTINCT indicador_id, data_name, ano
+            FROM valoresmeta AS v
+            WHERE ano IS NOT NULL AND data_name IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM {TABELA_CUBO} AS c
+                              WHERE c.data_name = v.data_name AND c.ano = v.ano)"""
+    )
+    pendentes = conn.execute("SELECT COUNT(*) FROM cubo_pendentes").fetchone()[0]
+    if pendentes:
+        # Todos os recortes viram texto para caber numa única coluna `valor`
+        colunas = ", ".join(
+            "CASE faixa_de_fronteira WHEN 1 THEN 'Sim' WHEN 0 THEN 'Não' END AS faixa_de_fronteira"
+            if coluna == "faixa_de_fronteira" else f'CAST("{coluna}" AS VARCHAR) AS "{coluna}"'
+            for coluna in RECORTES_CUBO
+        )
+        recortes = ", ".join(["brasil"] + [f'"{coluna}"' for coluna in RECORTES_CUBO])
+        conn.execute(
+            f"""INSERT INTO {TABELA_CUBO}
+                WITH populacao AS (
+                    SELECT geoloc_id, ano, value AS peso
+                    FROM valoresmeta
+                    WHERE data_name = ? AND value > 0
+                ),
+                valores AS (
+                    SELECT v.data_name, v.ano, v.geoloc_id, v.value, p.peso
+                    FROM valoresmeta AS v
+                    SEMI JOIN cubo_pendentes AS c ON c.indicador_id = v.indicador_id AND c.ano = v.ano
+                    ASOF LEFT JOIN populacao AS p ON p.geoloc_id = v.geoloc_id AND v.ano >= p.ano
+                    WHERE v.value IS NOT NULL
+                ),
+                recortes AS (
+                    UNPIVOT (SELECT codigo_ibge, 'Brasil' AS brasil, {colunas} FROM recortes_geograficos)
+                    ON {recortes} INTO NAME recorte VALUE valor
+                ),
+                agregados AS (
+                    SELECT
+                        v.data_name, v.ano, r.recorte, r.valor,
+                        COUNT(*) AS n,
+                        AVG(v.value) AS media,
+                        quantile_cont(v.value, [0.1, 0.25, 0.5, 0.75, 0.9]) AS q,
+                        MIN(v.value) AS minimo,
+                        MAX(v.value) AS maximo,
+                        SUM(v.value * v.peso) / SUM(v.peso) AS media_ponderada,
+                        SUM(v.peso) AS populacao
+                    FROM valores AS v
+                    JOIN recortes AS r ON r.codigo_ibge = v.geoloc_id
+                    GROUP BY ALL
+                )
+                SELECT data_name, ano, recorte, valor, n, media, q[3], q[1], q[2], q[4], q[5],
+                       minimo, maximo, media_ponderada, populacao
+                FROM agregados
+                ORDER BY data_name, recorte, valor, ano""",
+            [populacao],
+        )
+    conn.execute("DROP TABLE cubo_pendentes")
+    conn.execute("COMMIT")
+    conn.execute("CHECKPOINT")
+    return pendentes
+
+
+def sql_consulta(trecho, recorte="brasil", valor=None, ano=None):
+    """SELECT sobre o cubo para o indicador cujo nome contém `trecho`.
+
+    Sem `ano`, devolve o ano mais recente de cada indicador. A média sai na
+    coluna `value`, como nas consultas por município.
+    """
+    filtros = [f"recorte = '{_aspas(recorte)}'", f"data_name LIKE '%{_aspas(trecho)}%'"]
+    if valor is not None:
+        filtros.append(f"valor = '{_aspas(valor)}'")
+    if ano:
+        filtros.append(f"ano = {int(ano)}")
+    sql = (
+        "SELECT\n    data_name,\n    ano,\n    recorte,\n    valor,\n    n,\n    media AS value,\n"
+        "    mediana,\n    p10,\n    p25,\n    p75,\n    p90,\n    minimo,\n    maximo,\n    media_ponderada\n"
+        f"FROM\n    {TABELA_CUBO}\n"
+        "WHERE\n    " + "\n    AND ".join(filtros)
+    )
+    if not ano:
+        sql += "\nQUALIFY ano = MAX(ano) OVER (PARTITION BY data_name)"
+    return sql + "\nORDER BY data_name, value DESC;"
+
+
+class CuboRecortes:
+    """Consultas ao cubo pela conexão compartilhada (`banco.BancoDuckDB`)."""
+
+    def __init__(self, banco):
+        self.banco = banco
+        # As referências são lidas na thread da análise por IA, criada a cada
+        # consulta; um cursor compartilhado evita abrir e descartar um por thread
+        self._cursor = banco.novo_cursor()
+        self._trava = threading.Lock()
+
+    @staticmethod
+    def disponivel(banco):
+        """Indica se o cubo já foi gerado no banco."""
+        return banco.executar(
+            "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = ?", [TABELA_CUBO]
+        ).fetchone()[0] > 0
+
+    def consultar(self, trecho, recorte="brasil", valor=None, ano=None):
+        """Tabela Arrow com os agregados do recorte; ver `sql_consulta`."""
+        return self.banco.buscar_arrow(sql_consulta(trecho, recorte, valor, ano))
+
+    def referencias(self, data_name, ano, recortes=RECORTES_REFERENCIA):
+        """{recorte: {valor: {n, media, mediana, media_ponderada}}} de um indicador e ano."""
+        marcadores = ", ".join("?" for _ in recortes)
+        with self._trava:
+            linhas = self._cursor.execute(
+                f"""SELECT recorte, valor, n, media, mediana, media_ponderada FROM {TABELA_CUBO}
+                    WHERE data_name = ? AND ano = ? AND recorte IN ({marcadores})
+                    ORDER BY recorte, valor""",
+                [data_name, int(ano), *recortes],
+            ).fetchall()
+        referencias = {}
+        for recorte, valor, n, media, mediana, ponderada in linhas:
+            referencia = {"n": n, "media": _arredondar(media), "mediana": _arredondar(mediana)}
+            if ponderada is not None:
+                referencia["media_ponderada"] = _arredondar(ponderada)
+            referencias.setdefault(recorte, {})[valor] = referencia
+        return referencias
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera o cubo de agregados por recorte geográfico.")
+    parser.add_argument("--banco", default=CAMINHO_BANCO)
+    parser.add_argument("--completo", action="store_true", help="recalcula todos os anos")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    conn = duckdb.connect(args.banco)
+    pendentes = construir_cubo(conn, args.completo)
+    linhas = conn.execute(f"SELECT COUNT(*) FROM {TABELA_CUBO}").fetchone()[0]
+    conn.close()
+    print(f"Cubo atualizado em {time.perf_counter() - inicio:.1f} s "
+          f"({pendentes} pares indicador/ano calculados, {linhas} linhas no total)")
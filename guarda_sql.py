@@ -0,0 +1,219 @@
+"""Verificação do SQL antes da execução.
+
+Todo SQL (do planejador, do cache ou da LLM) passa por `GuardaSQL.preparar`:
+apenas um comando SELECT é aceito; padrões lentos conhecidos são reescritos
+para as tabelas de `preparar_banco.py`; colunas pesadas como `geometry` são
+removidas do resultado; um LIMIT é injetado; e o plano estimado pelo
+`EXPLAIN` é recusado se trouxer produto cartesiano ou cardinalidade alta
+demais. A execução é interrompida se passar do tempo limite.
+"""
+import json
+import logging
+import math
+import os
+import re
+import time
+
+import duckdb
+
+from banco import LIMITE_LINHAS
+
+log = logging.getLogger(__name__)
+
+# Limites configuráveis por variáveis de ambiente
+TEMPO_LIMITE = float(os.environ.get("PNDR_TEMPO_LIMITE", "30"))
+LIMITE_CARDINALIDADE = int(os.environ.get("PNDR_LIMITE_CARDINALIDADE", "100000000"))
+LIMITE_PRODUTO_CARTESIANO = int(os.environ.get("PNDR_LIMITE_PRODUTO_CARTESIANO", "1000000"))
+
+# Colunas que nunca são exibidas e pesam na leitura e na transferência
+COLUNAS_PESADAS = ("geometry",)
+
+# Formas de extrair o ano de `refdate`, trocadas pela coluna inteira `ano`
+_REFDATE = r"(?P<alias>\w+\.)?refdate"
+_EXPRESSOES_ANO = (
+    rf"\bstrftime\s*\(\s*'%Y'\s*,\s*{_REFDATE}\s*\)",
+    rf"\bstrftime\s*\(\s*{_REFDATE}\s*,\s*'%Y'\s*\)",
+    rf"\bextract\s*\(\s*year\s+from\s+{_REFDATE}\s*\)",
+    rf"\byear\s*\(\s*{_REFDATE}\s*\)",
+    rf"\bdate_part\s*\(\s*'year'\s*,\s*{_REFDATE}\s*\)",
+)
+_FILTROS_ANO = [
+    re.compile(rf"{expressao}\s*=\s*'?(?P<ano>\d{{4}})'?(?!\d)", re.IGNORECASE)
+    for expressao in _EXPRESSOES_ANO
+]
+
+# Filtro de indicador pelo nome, comparado linha a linha na tabela de valores
+_FILTRO_NOME = re.compile(
+    r"\b(?P<alias>\w+)\.data_name\s+(?P<operador>I?LIKE|=)\s+(?P<valor>'(?:[^']|'')*')",
+    re.IGNORECASE,
+)
+_ALIAS_INDICADORES = re.compile(r"\bindicadores\s+(?:AS\s+)?(\w+)", re.IGNORECASE)
+
+# Valor mais recente por subconsulta correlacionada sobre toda a tabela de valores
+_MAX_CORRELACIONADO = re.compile(
+    r"\b(?P<alias>\w+)\.refdate\s*=\s*\(\s*SELECT\s+MAX\s*\(\s*(?:\w+\.)?refdate\s*\)\s+"
+    r"FROM\s+valoresmeta(?:\s+(?:AS\s+)?(?!WHERE\b)\w+)?\s+WHERE\s+(?P<condicoes>[^()]*?)\s*\)",
+    re.IGNORECASE,
+)
+_CONDICAO = re.compile(r"(?:\w+\.)?(\w+)\s*=\s*(\w+)\.(\w+)")
+
+
+class ConsultaRejeitada(Exception):
+    """SQL recusado pela guarda; a mensagem explica o motivo."""
+
+
+def _reescrever_ano(sql):
+    for padrao in _FILTROS_ANO:
+        sql = padrao.sub(lambda m: f"{m['alias'] or ''}ano = {m['ano']}", sql)
+    return sql
+
+
+def _reescrever_nome_indicador(sql):
+    ignorados = {"indicadores"} | {a.lower() for a in _ALIAS_INDICADORES.findall(sql)}
+
+    def substituir(m):
+        if m["alias"].lower() in ignorados:
+            return m[0]
+        return (f"{m['alias']}.indicador_id IN (SELECT indicador_id FROM indicadores "
+                f"WHERE data_name {m['operador']} {m['valor']})")
+    return _FILTRO_NOME.sub(substituir, sql)
+
+
+def _reescrever_mais_recente(sql):
+    def substituir(m):
+        alias = m["alias"]
+        colunas = set()
+        for condicao in re.split(r"\s+AND\s+", m["condicoes"], flags=re.IGNORECASE):
+            c = _CONDICAO.fullmatch(condicao.strip())
+            if not c or c[1] != c[3] or c[2] != alias:
+                return m[0]
+            colunas.add(c[1].lower())
+        # Só equivale a valoresmeta_latest se correlacionar por município e indicador
+        if colunas not in ({"geoloc_id", "data_name"}, {"geoloc_id", "indicador_id"}):
+            return m[0]
+        return (f"EXISTS (SELECT 1 FROM valoresmeta_latest AS ultimo "
+                f"WHERE ultimo.geoloc_id = {alias}.geoloc_id "
+                f"AND ultimo.indicador_id = {alias}.indicador_id "
+                f"AND ultimo.refdate = {alias}.refdate)")
+    return _MAX_CORRELACIONADO.sub(substituir, sql)
+
+
+# Reescritas aplicadas em ordem; cada uma devolve o SQL inalterado se não se aplicar
+REESCRITAS = (
+    ("ano de refdate -> ano", _reescrever_ano),
+    ("data_name -> indicador_id", _reescrever_nome_indicador),
+    ("MAX(refdate) correlacionado -> valoresmeta_latest", _reescrever_mais_recente),
+)
+
+
+def _operadores(no, encontrados):
+    """Percorre o plano em JSON do EXPLAIN, anotando (operador, cardinalidade estimada).
+
+    Operadores sem estimativa própria herdam a dos filhos; o produto
+    cartesiano, o produto delas. Devolve a estimativa do nó.
+    """
+    filhos = [_operadores(filho, encontrados) for filho in no.get("children", [])]
+    nome = no["name"].strip()
+    estimativa = (no.get("extra_info") or {}).get("Estimated Cardinality")
+    if estimativa:
+        estimativa = int(estimativa)
+    elif nome == "CROSS_PRODUCT":
+        estimativa = math.prod(filhos)
+    else:
+        estimativa = max(filhos, default=0)
+    encontrados.append((nome, estimativa))
+    return estimativa
+
+
+class GuardaSQL:
+    """Valida, reescreve e limita o SQL antes de executá-lo no `BancoDuckDB`."""
+
+    def __init__(self, limite_linhas=LIMITE_LINHAS, tempo_limite=TEMPO_LIMITE,
+                 limite_cardinalidade=LIMITE_CARDINALIDADE,
+                 limite_produto_cartesiano=LIMITE_PRODUTO_CARTESIANO):
+        self.limite_linhas = limite_linhas
+        self.tempo_limite = tempo_limite
+        self.limite_cardinalidade = limite_cardinalidade
+        self.limite_produto_cartesiano = limite_produto_cartesiano
+        self.estatisticas = {"aceitas": 0, "reescritas": 0, "rejeitadas": 0, "interrompidas": 0}
+
+    def _rejeitar(self, motivo, sql, inicio):
+        self.estatisticas["rejeitadas"] += 1
+        log.warning("consulta rejeitada em %.1f ms: %s\n%s",
+                    1000 * (time.perf_counter() - inicio), motivo, sql)
+        raise ConsultaRejeitada(motivo)
+
+    def preparar(self, banco, sql):
+        """Devolve o SQL seguro para execução ou levanta `ConsultaRejeitada`."""
+        inicio = time.perf_counter()
+        # O parser do cursor da thread: `duckdb.extract_statements` usa a conexão
+        # padrão do módulo, que trava sob chamadas concorrentes
+        cursor = banco.cursor()
+        try:
+            comandos = cursor.extract_statements(sql)
+        except duckdb.Error as erro:
+            self._rejeitar(f"SQL inválido: {erro}", sql, inicio)
+        if len(comandos) != 1:
+            self._rejeitar("apenas um comando por consulta é permitido", sql, inicio)
+        if comandos[0].type != duckdb.StatementType.SELECT:
+            self._rejeitar(f"comando {comandos[0].type.name} não permitido", sql, inicio)
+        original = comandos[0].query.strip().rstrip(";").rstrip()
+
+        try:
+            cursor.execute(f"EXPLAIN {original}")
+        except duckdb.Error as erro:
+            self._rejeitar(f"SQL inválido: {erro}", original, inicio)
+
+        sql, aplicadas = original, []
+        for nome, reescrever in REESCRITAS:
+            reescrito = reescrever(sql)
+            if reescrito != sql:
+                sql = reescrito
+                aplicadas.append(nome)
+        if aplicadas:
+            try:
+                cursor.execute(f"EXPLAIN {sql}")
+            except duckdb.Error as erro:
+                # Uma reescrita que não compila é descartada; a consulta original segue
+                log.warning("reescrita descartada (%s): %s", ", ".join(aplicadas), erro)
+                sql, aplicadas = original, []
+
+        colunas = [linha[0] for linha in cursor.execute(f"DESCRIBE {sql}").fetchall()]
+        pesadas = [c for c in colunas if c.lower() in COLUNAS_PESADAS]
+        if pesadas and len(pesadas) == len(colunas):
+            self._rejeitar(f"a consulta retorna apenas colunas pesadas ({', '.join(pesadas)})", sql, inicio)
+        excluir = ""
+        if pesadas:
+            excluir = " EXCLUDE ({})".format(", ".join(f'"{c}"' for c in pesadas))
+        # A subconsulta permite ao DuckDB descartar as colunas pesadas já na leitura
+        sql = f"SELECT *{excluir} FROM (\n{sql}\n) AS consulta\nLIMIT {self.limite_linhas}"
+
+        plano = json.loads(cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}").fetchall()[0][1])
+        operadores = []
+        for no in plano:
+            _operadores(no, operadores)
+        for operador, estimativa in operadores:
+            if operador == "CROSS_PRODUCT" and estimativa > self.limite_produto_cartesiano:
+                self._rejeitar(f"produto cartesiano estimado em {estimativa} linhas", sql, inicio)
+            if estimativa > self.limite_cardinalidade:
+                self._rejeitar(f"{operador} estimado em {estimativa} linhas", sql, inicio)
+
+        self.estatisticas["aceitas"] += 1
+        if aplicadas:
+            self.estatisticas["reescritas"] += 1
+            log.info("consulta reescrita em %.1f ms (%s)",
+                     1000 * (time.perf_counter() - inicio), ", ".join(aplicadas))
+        else:
+            log.debug("consulta aceita em %.1f ms", 1000 * (time.perf_counter() - inicio))
+        return sql
+
+    def executar(self, banco, sql):
+        """Executa SQL já preparado como tabela Arrow, interrompendo-o após `tempo_limite`."""
+        inicio = time.perf_counter()
+        try:
+            return banco.buscar_arrow(sql, self.limite_linhas, tempo_limite=self.tempo_limite)
+        except duckdb.InterruptException:
+            self.estatisticas["interrompidas"] += 1
+            log.warning("consulta interrompida após %.1f s\n%s", time.perf_counter() - inicio, sql)
+            raise ConsultaRejeitada(
+                f"a consulta excedeu o tempo limite de {self.tempo_limite:g} s; refine a pergunta")
@@ -0,0 +1,133 @@
+"""Registro da latência por etapa do pipeline de consulta.
+
+Cada etapa (carga da malha, geração do SQL, consulta ao DuckDB, análise por
+IA, gráfico e mapa) roda dentro de um `span`, que grava num SQLite local o
+tempo de parede e, quando informados, linhas, bytes, tokens da LLM e o SQL.
+A página de administração (`pages/admin.py`) lê esse registro.
+"""
+import json
+import math
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+CAMINHO_SPANS = "data/spans.sqlite"
+
+# Campos com coluna própria; os demais atributos do span vão para `detalhes`
+CAMPOS = ("linhas", "bytes", "tokens_entrada", "tokens_saida", "sql")
+
+
+def percentil(valores, p):
+    """Percentil por posição mais próxima de uma lista já ordenada."""
+    if not valores:
+        return None
+    return valores[max(0, math.ceil(p / 100 * len(valores)) - 1)]
+
+
+class RegistroSpans:
+    """Grava e consulta spans de latência num SQLite local."""
+
+    def __init__(self, caminho=CAMINHO_SPANS, max_spans=100_000):
+        self.max_spans = max_spans
+        self._trava = threading.Lock()
+        self._gravados = 0
+        self._conn = sqlite3.connect(caminho, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS spans (
+                   id INTEGER PRIMARY KEY AUTOINCREMENT,
+                   etapa TEXT NOT NULL,
+                   inicio REAL NOT NULL,
+                   duracao REAL NOT NULL,
+                   linhas INTEGER,
+                   bytes INTEGER,
+                   tokens_entrada INTEGER,
+                   tokens_saida INTEGER,
+                   sql TEXT,
+                   erro TEXT,
+                   detalhes TEXT
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS spans_etapa ON spans (etapa, inicio)")
+        self._conn.commit()
+
+    @contextmanager
+    def span(self, etapa, **atributos):
+        """Mede o bloco; o dicionário entregue recebe linhas, bytes, tokens, sql etc.
+
+        O span é gravado mesmo se o bloco levantar exceção, com o erro anotado.
+        """
+        dados = dict(atributos)
+        inicio, relogio = time.time(), time.perf_counter()
+        erro = None
+        try:
+            yield dados
+        except BaseException as e:
+            erro = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.gravar(etapa, inicio, time.perf_counter() - relogio, dados, erro)
+
+    def gravar(self, etapa, inicio, duracao, dados, erro=None):
+        detalhes = {k: v for k, v in dados.items() if k not in CAMPOS}
+        with self._trava:
+            self._conn.execute(
+                """INSERT INTO spans (etapa, inicio, duracao, linhas, bytes, tokens_entrada,
+                                      tokens_saida, sql, erro, detalhes)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (etapa, inicio, duracao, *(dados.get(c) for c in CAMPOS), erro,
+                 json.dumps(detalhes, ensure_ascii=False, default=str) if detalhes else None),
+            )
+            self._gravados += 1
+            # Descarta os spans mais antigos de tempos em tempos
+            if self._gravados % 1000 == 0:
+                self._conn.execute(
+                    "DELETE FROM spans WHERE id <= (SELECT MAX(id) FROM spans) - ?", (self.max_spans,))
+            self._conn.commit()
+
+    #######################
+    # Consultas para a página de administração
+
+    def percentis(self, desde=0.0):
+        """Por etapa: número de spans, p50, p90, p99 e máximo da duração (s), erros e médias."""
+        with self._trava:
+            linhas = self._conn.execute(
+                """SELECT etapa, duracao, erro IS NOT NULL, linhas, bytes, tokens_entrada, tokens_saida
+                   FROM spans WHERE inicio >= ? ORDER BY etapa, duracao""", (desde,)
+            ).fetchall()
+        por_etapa = {}
+        for etapa, *resto in linhas:
+            por_etapa.setdefault(etapa, []).append(resto)
+        resumo = []
+        for etapa, spans in por_etapa.items():
+            duracoes = [s[0] for s in spans]
+
+            def media(i):
+                valores = [s[i] for s in spans if s[i] is not None]
+                return sum(valores) / len(valores) if valores else None
+            resumo.append({
+                "etapa": etapa,
+                "n": len(spans),
+                "p50": percentil(duracoes, 50),
+                "p90": percentil(duracoes, 90),
+                "p99": percentil(duracoes, 99),
+                "max": duracoes[-1],
+                "erros": sum(s[1] for s in spans),
+                "linhas_media": media(2),
+                "bytes_media": media(3),
+                "tokens_entrada_media": media(4),
+                "tokens_saida_media": media(5),
+            })
+        return sorted(resumo, key=lambda r: r["p50"], reverse=True)
+
+    def mais_lentos(self, etapa="fetch_data", desde=0.0, n=20):
+        """Os `n` spans mais lentos da etapa, com SQL e detalhes."""
+        with self._trava:
+            cursor = self._conn.execute(
+                """SELECT id, inicio, duracao, linhas, bytes, sql, erro, detalhes FROM spans
+                   WHERE etapa = ? AND inicio >= ? ORDER BY duracao DESC LIMIT ?""", (etapa, desde, n))
+            colunas = [c[0] for c in cursor.description]
+            return [dict(zip(colunas, linha)) for linha in cursor.fetchall()]
+
+    def fechar(self):
+        self._conn.close()
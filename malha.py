@@ -0,0 +1,358 @@
+"""Malha municipal local, simplificada e particionada por UF.
+
+Gera a partir da malha do IBGE um armazenamento em disco com uma cópia
+pré-simplificada por nível de detalhe (sem abrir frestas entre vizinhos), um
+arquivo por UF e um índice de deslocamentos por `codarea`. A leitura é
+preguiçosa e usa `mmap`, de modo que só os municípios pedidos são decodificados.
+
+Para gerar a malha:
+    python malha.py                      # baixa do IBGE
+    python malha.py --origem malha.json  # usa um GeoJSON local
+"""
+import argparse
+import json
+import mmap
+import os
+import threading
+
+URL_IBGE = "https://servicodados.ibge.gov.br/api/v3/malhas/paises/BR?formato=application/vnd.geo+json&qualidade=maxima&intrarregiao=municipio"
+DIRETORIO_MALHA = "data/malha"
+
+# Tolerância de simplificação (em graus) por nível de detalhe, do mais fino ao mais grosso.
+# O nome indica o maior zoom do Folium em que o nível ainda é adequado.
+NIVEIS = {
+    "z8": 0.0005,
+    "z6": 0.003,
+    "z4": 0.015,
+}
+
+# Primeiro dígito do código IBGE -> grande região
+REGIOES = {
+    "1": "Norte",
+    "2": "Nordeste",
+    "3": "Sudeste",
+    "4": "Sul",
+    "5": "Centro-Oeste",
+}
+
+#######################
+# Simplificação
+
+def _distancia_segmento(p, a, b):
+    """Distância (ao quadrado) do ponto p ao segmento ab."""
+    ax, ay = a
+    bx, by = b
+    px, py = p
+    dx, dy = bx - ax, by - ay
+    if dx == 0 and dy == 0:
+        return (px - ax) ** 2 + (py - ay) ** 2
+    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / (dx * dx + dy * dy)))
+    qx, qy = ax + t * dx, ay + t * dy
+    return (px - qx) ** 2 + (py - qy) ** 2
+
+
+def simplificar_linha(pontos, tolerancia):
+    """Douglas-Peucker iterativo sobre uma lista de coordenadas."""
+    if len(pontos) < 3:
+        return list(pontos)
+    tol2 = tolerancia * tolerancia
+    manter = [False] * len(pontos)
+    manter[0] = manter[-1] = True
+    pilha = [(0, len(pontos) - 1)]
+    while pilha:
+        inicio, fim = pilha.pop()
+        maior, indice = 0.0, None
+        for i in range(inicio + 1, fim):
+            d = _distancia_segmento(pontos[i], pontos[inicio], pontos[fim])
+            if d > maior:
+                maior, indice = d, i
+        if indice is not None and maior > tol2:
+            manter[indice] = True
+            pilha.append((inicio, indice))
+            pilha.append((indice, fim))
+    return [p for p, m in zip(pontos, manter) if m]
+
+
+#######################
+# Topologia
+#
+# Municípios vizinhos compartilham a fronteira. Simplificar cada polígono
+# separadamente remove vértices diferentes dos dois lados e abre frestas e
+# sobreposições nos níveis mais grossos. Por isso os anéis são divididos em
+# arcos entre junções (vértices onde muda o conjunto de anéis que passam por
+# eles) e cada arco é simplificado uma única vez, sendo reutilizado por todos
+# os anéis que o percorrem. As junções nunca são removidas.
+
+def _poligonos(geometria):
+    if geometria["type"] == "Polygon":
+        return [geometria["coordinates"]]
+    return geometria["coordinates"]
+
+
+def _anel_aberto(anel):
+    pontos = [tuple(p) for p in anel]
+    if len(pontos) > 1 and pontos[0] == pontos[-1]:
+        pontos.pop()
+    return pontos
+
+
+def _arcos_do_anel(pontos, aneis_do_ponto):
+    """Divide um anel (sem o ponto de fechamento) em arcos entre junções."""
+    n = len(pontos)
+    juncoes = [
+        i for i in range(n)
+        if aneis_do_ponto[pontos[i]] != aneis_do_ponto[pontos[i - 1]]
+        or aneis_do_ponto[pontos[i]] != aneis_do_ponto[pontos[(i + 1) % n]]
+    ]
+    if not juncoes:
+        # Anel sem vizinhos diferentes ao longo dele (ilha ou enclave): um único
+        # arco fechado, que começa no menor ponto para coincidir nos dois lados
+        inicio = pontos.index(min(pontos))
+        return [pontos[inicio:] + pontos[:inicio + 1]]
+    arcos = []
+    for atual, proxima in zip(juncoes, juncoes[1:] + [juncoes[0] + n]):
+        arcos.append([pontos[i % n] for i in range(atual, proxima + 1)])
+    return arcos
+
+
+def topologia(geometrias):
+    """Arcos compartilhados de um conjunto de geometrias {codarea: geometria}.
+
+    Devolve a lista de arcos (listas de pontos) e, por município, os polígonos
+    como listas de anéis, cada anel uma lista de (índice do arco, invertido).
+    Geometrias que não são Polygon/MultiPolygon ficam de fora.
+    """
+    aneis = {}
+    for codarea, geometria in geometrias.items():
+        if geometria["type"] in ("Polygon", "MultiPolygon"):
+            aneis[codarea] = [[_anel_aberto(a) for a in p] for p in _poligonos(geometria)]
+
+    # Anéis que passam por cada vértice
+    aneis_do_ponto = {}
+    contador = 0
+    for poligonos in aneis.values():
+        for poligono in poligonos:
+            for anel in poligono:
+                for ponto in set(anel):
+                    aneis_do_ponto.setdefault(ponto, []).append(contador)
+                contador += 1
+
+    arcos, indices, municipios = [], {}, {}
+    for codarea, poligonos in aneis.items():
+        municipios[codarea] = []
+        for poligono in poligonos:
+            referencias = []
+            for anel in poligono:
+                referencias.append([])
+                for arco in _arcos_do_anel(anel, aneis_do_ponto):
+                    # O arco é guardado num só sentido; o vizinho o percorre invertido
+                    direto, inverso = tuple(arco), tuple(reversed(arco))
+                    chave, invertido = (direto, False) if direto <= inverso else (inverso, True)
+                    if chave not in indices:
+                        indices[chave] = len(arcos)
+                        arcos.append(list(chave))
+                    referencias[-1].append((indices[chave], invertido))
+            municipios[codarea].append(referencias)
+    return arcos, municipios
+
+
+def simplificar_malha(geometrias, tolerancia, topo=None):
+    """Simplifica as geometrias {codarea: geometria} preservando as fronteiras comuns.
+
+    `topo` é o resultado de `topologia(geometrias)`, para reaproveitá-lo entre
+    níveis. Nenhum município fica sem geometria: os menores que a tolerância
+    viram um triângulo do seu maior anel.
+    """
+    arcos, municipios = topo or topologia(geometrias)
+    simplificados = [simplificar_linha(arco, tolerancia) for arco in arcos]
+
+    resultado = {}
+    for codarea, geometria in geometrias.items():
+        if codarea not in municipios:
+            resultado[codarea] = geometria
+            continue
+        poligonos = []
+        for referencias in municipios[codarea]:
+            aneis = []
+            for anel_arcos in referencias:
+                anel = []
+                for arco, invertido in anel_arcos:
+                    pontos = simplificados[arco][::-1] if invertido else simplificados[arco]
+                    anel.extend(pontos[1:] if anel else pontos)
+                # Anéis degenerados: o polígono some se for o externo, o buraco é descartado
+                if len(anel) >= 4:
+                    aneis.append(anel)
+                elif not aneis:
+                    break
+            else:
+                if aneis:
+                    poligonos.append(aneis)
+        if not poligonos:
+            anel = max(_poligonos(geometria), key=lambda p: len(p[0]))[0]
+            n = len(anel)
+            poligonos = [[[anel[0], anel[n // 3], anel[2 * n // 3], anel[0]]]]
+        if len(poligonos) == 1:
+            resultado[codarea] = {"type": "Polygon", "coordinates": poligonos[0]}
+        else:
+            resultado[codarea] = {"type": "MultiPolygon", "coordinates": poligonos}
+    return resultado
+
+#######################
+# Construção
+
+def baixar_malha_ibge(url=URL_IBGE):
+    """Baixa a malha municipal completa do IBGE."""
+    # Só a construção offline baixa a malha; o aplicativo não precisa importar requests
+    import requests
+    resposta = requests.get(url, timeout=300)
+    resposta.raise_for_status()
+    return resposta.json()
+
+
+def construir_malha(geojson, destino=DIRETORIO_MALHA, niveis=NIVEIS):
+    """Grava a malha simplificada por nível e por UF, com índice por `codarea`."""
+    indice = {"niveis": dict(niveis), "ufs": {}, "regioes": {}}
+
+    geometrias = {str(f["properties"]["codarea"]): f["geometry"] for f in geojson["features"]}
+    por_uf = {}
+    for codarea in sorted(geometrias):
+        por_uf.setdefault(codarea[:2], []).append(codarea)
+
+    # A topologia é a mesma em todos os níveis; só a tolerância muda
+    topo = topologia(geometrias)
+    for nivel, tolerancia in niveis.items():
+        simplificadas = simplificar_malha(geometrias, tolerancia, topo)
+        pasta = os.path.join(destino, nivel)
+        os.makedirs(pasta, exist_ok=True)
+        for uf, municipios in sorted(por_uf.items()):
+            deslocamentos = {}
+            with open(os.path.join(pasta, f"{uf}.geojsonl"), "wb") as arquivo:
+                for codarea in municipios:
+                    feature = {
+                        "type": "Feature",
+                        "properties": {"codarea": codarea},
+                        "geometry": simplificadas[codarea],
+                    }
+                    linha = json.dumps(feature, separators=(",", ":")).encode("utf-8")
+                    deslocamentos[codarea] = [arquivo.tell(), len(linha)]
+                    arquivo.write(linha + b"\n")
+            indice["ufs"].setdefault(uf, {})[nivel] = deslocamentos
+
+    for uf in sorted(por_uf):
+        indice["regioes"].setdefault(uf[0], []).append(uf)
+
+    with open(os.path.join(destino, "indice.json"), "w", encoding="utf-8") as arquivo:
+        json.dump(indice, arquivo, separators=(",", ":"))
+    return indice
+
+#######################
+# Leitura
+
+class MalhaMunicipal:
+    """Acesso preguiçoso à malha gerada por `construir_malha`."""
+
+    def __init__(self, diretorio=DIRETORIO_MALHA):
+        self.diretorio = diretorio
+        self._indice = None
+        self._mapas = {}
+        self._trava = threading.Lock()
+
+    @staticmethod
+    def disponivel(diretorio=DIRETORIO_MALHA):
+        """Indica se a malha já foi gerada em `diretorio` (`python malha.py`)."""
+        return os.path.exists(os.path.join(diretorio, "indice.json"))
+
+    @property
+    def indice(self):
+        if self._indice is None:
+            with open(os.path.join(self.diretorio, "indice.json"), encoding="utf-8") as arquivo:
+                self._indice = json.load(arquivo)
+        return self._indice
+
+    @property
+    def niveis(self):
+        """Níveis do mais detalhado ao mais simplificado."""
+        return sorted(self.indice["niveis"], key=self.indice["niveis"].get)
+
+    def nivel_para_zoom(self, zoom):
+        """Escolhe o nível mais simplificado adequado ao zoom do mapa."""
+        for nivel in reversed(self.niveis):
+            if zoom <= int(nivel[1:]):
+                return nivel
+        return self.niveis[0]
+
+    def _mapa(self, nivel, uf):
+        chave = (nivel, uf)
+        if chave not in self._mapas:
+            with self._trava:
+                if chave not in self._mapas:
+                    caminho = os.path.join(self.diretorio, nivel, f"{uf}.geojsonl")
+                    with open(caminho, "rb") as arquivo:
+                        self._mapas[chave] = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mapas[chave]
+
+    def features(self, codareas, nivel):
+        """Lista as features dos municípios pedidos; códigos desconhecidos são ignorados."""
+        por_uf = {}
+        for codarea in {str(c) for c in codareas}:
+            por_uf.setdefault(codarea[:2], []).append(codarea)
+
+        features = []
+        for uf, codigos in sorted(por_uf.items()):
+            deslocamentos = self.indice["ufs"].get(uf, {}).get(nivel)
+            if not deslocamentos:
+                continue
+            mapa = self._mapa(nivel, uf)
+            for codarea in sorted(codigos):
+                if codarea in deslocamentos:
+                    inicio, tamanho = deslocamentos[codarea]
+                    features.append(json.loads(mapa[inicio:inicio + tamanho]))
+        return features
+
+    def feature_collection(self, codareas, nivel):
+        """GeoJSON com apenas os municípios pedidos."""
+        return {"type": "FeatureCollection", "features": self.features(codareas, nivel)}
+
+    def por_uf(self, uf, nivel):
+        """GeoJSON de todos os municípios de uma UF (código de 2 dígitos)."""
+        codigos = self.indice["ufs"].get(str(uf), {}).get(nivel, {})
+        return self.feature_collection(codigos, nivel)
+
+    def por_regiao(self, regiao, nivel):
+        """GeoJSON de uma grande região (primeiro dígito do código IBGE)."""
+        codigos = []
+        for uf in self.indice["regioes"].get(str(regiao), []):
+            codigos.extend(self.indice["ufs"][uf].get(nivel, {}))
+        return self.feature_collection(codigos, nivel)
+
+    def fechar(self):
+        for mapa in self._mapas.values():
+            mapa.close()
+        self._mapas.clear()
+
+
+def escolher_zoom(latitudes, longitudes):
+    """Zoom inicial do Folium a partir da extensão dos pontos."""
+    latitudes, longitudes = list(latitudes), list(longitudes)
+    if not latitudes:
+        return 4
+    extensao = max(max(latitudes) - min(latitudes), max(longitudes) - min(longitudes), 0.01)
+    for limite, zoom in ((1, 9), (3, 8), (6, 7), (12, 6), (25, 5)):
+        if extensao <= limite:
+            return zoom
+    return 4
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera a malha municipal local simplificada.")
+    parser.add_argument("--origem", help="GeoJSON da malha do IBGE já baixado")
+    parser.add_argument("--destino", default=DIRETORIO_MALHA)
+    args = parser.parse_args()
+
+    if args.origem:
+        with open(args.origem, encoding="utf-8") as arquivo:
+            malha = json.load(arquivo)
+    else:
+        malha = baixar_malha_ibge()
+    construir_malha(malha, args.destino)
+    print(f"{len(malha['features'])} municípios gravados em {args.destino}")
@@ -0,0 +1,83 @@
+"""Camadas do mapa coroplético a partir da malha municipal local.
+
+Cada camada base corresponde a uma UF num nível de detalhe: as geometrias são
+lidas da malha, têm as coordenadas quantizadas (arredondadas conforme o zoom)
+e ficam em cache. O GeoJSON de um mapa contém apenas os municípios do
+resultado, montado a partir das camadas das UFs envolvidas.
+"""
+import threading
+from collections import OrderedDict
+
+# Casas decimais das coordenadas por nível (0,01° ≈ 1 km)
+CASAS_DECIMAIS = {"z8": 4, "z6": 3, "z4": 2}
+
+
+def _quantizar_anel(anel, casas):
+    pontos = []
+    for x, y in anel:
+        ponto = [round(x, casas), round(y, casas)]
+        if not pontos or ponto != pontos[-1]:
+            pontos.append(ponto)
+    # Anéis que colapsam no arredondamento mantêm a forma original
+    if len(pontos) < 4:
+        return [[round(x, casas), round(y, casas)] for x, y in anel]
+    return pontos
+
+
+def quantizar_geometria(geometria, casas):
+    """Arredonda as coordenadas e remove pontos repetidos em sequência."""
+    if geometria["type"] == "Polygon":
+        coordenadas = [_quantizar_anel(a, casas) for a in geometria["coordinates"]]
+    elif geometria["type"] == "MultiPolygon":
+        coordenadas = [[_quantizar_anel(a, casas) for a in p] for p in geometria["coordinates"]]
+    else:
+        return geometria
+    return {"type": geometria["type"], "coordinates": coordenadas}
+
+
+class CamadasMapa:
+    """Cache LRU das camadas base por (UF, nível) sobre uma `MalhaMunicipal`."""
+
+    def __init__(self, malha, max_camadas=40):
+        self.malha = malha
+        self.max_camadas = max_camadas
+        self._camadas = OrderedDict()
+        self._trava = threading.Lock()
+
+    def nivel_para_zoom(self, zoom):
+        return self.malha.nivel_para_zoom(zoom)
+
+    def camada_uf(self, uf, nivel):
+        """Features quantizadas de uma UF, indexadas por `codarea`."""
+        chave = (str(uf), nivel)
+        with self._trava:
+            if chave in self._camadas:
+                self._camadas.move_to_end(chave)
+                return self._camadas[chave]
+
+        casas = CASAS_DECIMAIS.get(nivel, 4)
+        camada = {}
+        for feature in self.malha.por_uf(uf, nivel)["features"]:
+            camada[feature["properties"]["codarea"]] = {
+                "type": "Feature",
+                "properties": feature["properties"],
+                "geometry": quantizar_geometria(feature["geometry"], casas),
+            }
+
+        with self._trava:
+            self._camadas[chave] = camada
+            while len(self._camadas) > self.max_camadas:
+                self._camadas.popitem(last=False)
+        return camada
+
+    def geojson(self, codareas, nivel):
+        """GeoJSON com apenas os municípios pedidos."""
+        por_uf = {}
+        for codarea in {str(c) for c in codareas}:
+            por_uf.setdefault(codarea[:2], []).append(codarea)
+
+        features = []
+        for uf, codigos in sorted(por_uf.items()):
+            camada = self.camada_uf(uf, nivel)
+            features.extend(camada[c] for c in sorted(codigos) if c in camada)
+        return {"type": "FeatureCollection", "features": features}
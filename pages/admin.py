@@ -0,0 +1,67 @@
+import os
+import time
+
+import duckdb
+import pandas as pd
+import streamlit as st
+
+from banco import CAMINHO_BANCO, banco_atual
+from instrumentacao import RegistroSpans
+
+#######################
+# Página de administração: latência por etapa e consultas mais lentas.
+# Só é exibida com PNDR_ADMIN=1 no ambiente.
+st.set_page_config(page_title="Administração - Painel PNDR", layout="wide")
+
+if os.environ.get("PNDR_ADMIN") != "1":
+    st.info("Página de administração desabilitada. Defina PNDR_ADMIN=1 para habilitá-la.")
+    st.stop()
+
+@st.cache_resource
+def get_registro_admin():
+    return RegistroSpans()
+
+# A mesma conexão do aplicativo: outra conexão ao arquivo impediria reabri-lo
+def get_banco_admin():
+    return banco_atual(CAMINHO_BANCO)
+
+registro = get_registro_admin()
+
+st.title("⏱️ Latência do pipeline de consulta")
+horas = st.number_input("Período (últimas horas)", min_value=1, max_value=24 * 90, value=24)
+desde = time.time() - horas * 3600
+
+#######################
+# Percentis por etapa
+st.header("Percentis por etapa", divider="gray")
+percentis = pd.DataFrame(registro.percentis(desde))
+if percentis.empty:
+    st.write("Nenhum span registrado no período.")
+    st.stop()
+st.caption("Durações em segundos; médias de linhas, bytes e tokens por span.")
+st.dataframe(percentis, hide_index=True)
+
+#######################
+# Consultas mais lentas, com o perfil do DuckDB
+st.header("Consultas mais lentas", divider="gray")
+etapas = list(percentis["etapa"])
+etapa = st.selectbox("Etapa", etapas, index=etapas.index("fetch_data") if "fetch_data" in etapas else 0)
+lentos = registro.mais_lentos(etapa, desde)
+st.dataframe(pd.DataFrame(lentos).drop(columns=["sql"]), hide_index=True)
+
+com_sql = [s for s in lentos if s["sql"]]
+if com_sql:
+    escolhido = st.selectbox(
+        "Span", com_sql,
+        format_func=lambda s: f"#{s['id']} — {s['duracao']:.2f} s — {(s['linhas'] or 0)} linhas")
+    st.code(escolhido["sql"], language="sql")
+    if escolhido["erro"]:
+        st.error(escolhido["erro"])
+    # Só o SQL de fetch_data já passou pela guarda (um único SELECT, com LIMIT)
+    if etapa == "fetch_data" and st.button("Executar EXPLAIN ANALYZE"):
+        try:
+            with st.spinner("Perfilando consulta..."):
+                perfil = get_banco_admin().executar(f"EXPLAIN ANALYZE {escolhido['sql']}").fetchall()[0][1]
+            st.code(perfil, language=None)
+        except duckdb.Error as erro:
+            st.error(f"Não foi possível perfilar a consulta: {erro}")
@@ -0,0 +1,56 @@
+"""Execução concorrente da análise por IA.
+
+A análise da LLM é a etapa mais lenta depois da consulta. Ela roda numa
+thread própria enquanto tabela, gráfico e mapa são desenhados; os trechos de
+texto recebidos ficam numa fila e são consumidos pela thread do Streamlit,
+que é a única que escreve na página.
+"""
+import queue
+import threading
+
+_FIM = object()
+
+
+class AnaliseEmSegundoPlano:
+    """Consome em segundo plano um fluxo de trechos de texto."""
+
+    def __init__(self, gerar_fluxo):
+        self._fila = queue.Queue()
+        self._recebidos = []
+        self._terminou = False
+        self._erro = None
+        self._thread = threading.Thread(target=self._consumir, args=(gerar_fluxo,), daemon=True)
+        self._thread.start()
+
+    def _consumir(self, gerar_fluxo):
+        try:
+            for trecho in gerar_fluxo():
+                if trecho:
+                    self._fila.put(trecho)
+        except Exception as erro:
+            self._fila.put(erro)
+        finally:
+            self._fila.put(_FIM)
+
+    def trechos(self):
+        """Entrega os trechos à medida que chegam; erros da thread são relançados aqui.
+
+        Uma nova chamada (por exemplo, após um rerun do Streamlit) repete
+        primeiro os trechos já entregues.
+        """
+        yield from list(self._recebidos)
+        while not self._terminou:
+            item = self._fila.get()
+            if item is _FIM:
+                self._terminou = True
+            elif isinstance(item, Exception):
+                self._erro = item
+            else:
+                self._recebidos.append(item)
+                yield item
+        if self._erro is not None:
+            raise self._erro
+
+    def texto(self):
+        """Aguarda o fim da análise e devolve o texto completo."""
+        return "".join(self.trechos())
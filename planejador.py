@@ -0,0 +1,401 @@
+"""Planejador determinístico: perguntas estruturadas -> SQL sem chamar a LLM.
+
+Reconhece perguntas no formato "indicador + recorte geográfico + ano opcional"
+comparando o texto com os valores reais de `valoresmeta.data_name` e das
+colunas de recorte de `recortes_geograficos`. Perguntas agregadas ("média
+por estado", "mediana nacional") são respondidas pelo cubo de `cubo.py`,
+quando ele existe. Quando a confiança é baixa, devolve None e a pergunta
+segue para a LLM.
+"""
+import difflib
+import re
+
+from cache_sql import normalizar_pergunta
+from cubo import RECORTES_CUBO, CuboRecortes, sql_consulta
+
+# Colunas de recorte, em ordem de prioridade quando um mesmo nome aparece em mais de uma
+COLUNAS_RECORTE = (
+    "estado",
+    "região",
+    "tipologia",
+    "participacao_semiarido",
+    "participacao_sudene",
+    "participacao_amazonia_legal",
+    "município",
+    "regiao_imediata",
+    "regiao_intermediaria",
+)
+
+# Palavras da pergunta que indicam a coluna de recorte pretendida
+PISTAS_RECORTE = {
+    "imediata": "regiao_imediata",
+    "intermediaria": "regiao_intermediaria",
+    "municipio": "município",
+    "tipologia": "tipologia",
+    "semiarido": "participacao_semiarido",
+    "sudene": "participacao_sudene",
+    "amazonia": "participacao_amazonia_legal",
+}
+
+STOPWORDS = {
+    "a", "ao", "aos", "as", "com", "da", "das", "de", "do", "dos", "e", "em", "na", "nas",
+    "no", "nos", "o", "os", "para", "paro", "pela", "pelo", "por", "um", "uma",
+}
+
+# Palavras genéricas de nomes de indicadores: contam menos na escolha do trecho
+GENERICAS = {"indicador", "indice", "taxa", "percentual", "numero", "composto"}
+
+# Vocabulário esperado nas perguntas que não representa filtro
+NEUTRAS = {
+    "qual", "quais", "como", "esta", "estao", "crie", "criar", "gere", "gerar", "mostre",
+    "mostrar", "liste", "listar", "lista", "retorne", "grafico", "mapa", "tabela", "dados",
+    "valor", "valores", "indicador", "indicadores", "municipios", "municipio", "estado",
+    "regiao", "imediata", "intermediaria", "ano", "considere", "temo", "termo", "exato",
+    "exata", "sobre", "situacao", "retornar", "retorna",
+}
+
+# Palavras que pedem a série de todos os anos em vez do valor mais recente
+SERIE_HISTORICA = {"evolucao", "historico", "historica", "serie", "tendencia", "trajetoria"}
+
+# Palavras que pedem um agregado do cubo em vez dos valores por município
+AGREGACOES = {
+    "media", "medias", "mediana", "medianas", "compare", "comparar", "comparacao", "comparativo",
+    "agregado", "agregados",
+}
+
+# Palavras que nomeiam um recorte do cubo; "por estado", "entre as regiões" etc.
+DIMENSOES_CUBO = {
+    "estado": "estado", "estados": "estado", "uf": "estado", "ufs": "estado",
+    "regiao": "região", "regioes": "região",
+    "tipologia": "tipologia", "tipologias": "tipologia",
+    "semiarido": "participacao_semiarido",
+    "sudene": "participacao_sudene",
+    "amazonia": "participacao_amazonia_legal",
+    "fronteira": "faixa_de_fronteira",
+}
+
+# Recortes com dois valores (Sim/Não): a simples menção basta numa pergunta agregada
+DIMENSOES_BINARIAS = {"participacao_semiarido", "participacao_sudene",
+                      "participacao_amazonia_legal", "faixa_de_fronteira"}
+
+# Vocabulário das perguntas agregadas que não representa filtro
+NEUTRAS_AGREGACAO = {"nacional", "brasil", "pais", "entre", "faixa", "legal", "nao", "demais", "resto", "fora"}
+
+# Palavras de ordenação, com a forma canônica; mudam o resultado mesmo numa pergunta quase idêntica
+ORDENACAO = {
+    "maior": "maior", "maiores": "maior", "menor": "menor", "menores": "menor",
+    "crescente": "crescente", "decrescente": "decrescente",
+}
+
+VALORES_SEM_CONTEUDO = {"sim", "nao", "s", "n", "0", "1", "true", "false"}
+
+LIMIAR_CONFIANCA = 0.8
+
+
+def _tokens(texto):
+    return re.findall(r"[a-z0-9]+", normalizar_pergunta(texto))
+
+
+def _tokens_acentuados(texto):
+    """Tokens em minúsculas preservando acentos (distingue "Pará" de "para")."""
+    return re.findall(r"[^\W_]+", texto.lower())
+
+
+def _peso(tokens):
+    return sum(0 if t in STOPWORDS else 0.5 if t in GENERICAS else 1 for t in tokens)
+
+
+def _aspas(valor):
+    return valor.replace("'", "''")
+
+
+class Catalogo:
+    """Valores de indicadores e recortes disponíveis no banco."""
+
+    def __init__(self, indicadores, recortes, cubo=False):
+        self.indicadores = list(indicadores)
+        self.recortes = {coluna: list(valores) for coluna, valores in recortes.items()}
+        self.cubo = cubo
+
+    @classmethod
+    def do_banco(cls, banco):
+        indicadores = [
+            linha[0]
+            for linha in banco.executar(
+                "SELECT data_name FROM indicadores"
+            ).fetchall()
+        ]
+        recortes = {}
+        for coluna in COLUNAS_RECORTE:
+            recortes[coluna] = [
+                linha[0]
+                for linha in banco.executar(
+                    f'SELECT DISTINCT "{coluna}" FROM recortes_geograficos WHERE "{coluna}" IS NOT NULL'
+                ).fetchall()
+            ]
+        return cls(indicadores, recortes, CuboRecortes.disponivel(banco))
+
+
+class Planejador:
+    """Gera o SQL de perguntas estruturadas a partir do catálogo."""
+
+    def __init__(self, catalogo, limiar=LIMIAR_CONFIANCA):
+        self.limiar = limiar
+        self.cubo = catalogo.cubo
+
+        # n-gramas dos nomes de indicadores -> trecho original
+        self._ngramas_indicador = {}
+        for nome in catalogo.indicadores:
+            palavras = nome.split()
+            normalizadas = [_tokens(p) for p in palavras]
+            for i in range(len(palavras)):
+                for j in range(i + 1, len(palavras) + 1):
+                    chave = tuple(t for n in normalizadas[i:j] for t in n)
+                    if chave:
+                        self._ngramas_indicador.setdefault(chave, " ".join(palavras[i:j]))
+
+        # valores de recorte -> [(coluna, valor original)]
+        # Valores que sem acento viram stopwords ("Pará") só casam com a grafia acentuada
+        self._valores_recorte = {}
+        self._valores_acentuados = {}
+        for coluna, valores in catalogo.recortes.items():
+            for valor in valores:
+                chave = tuple(_tokens(str(valor)))
+                if not chave or set(chave) <= VALORES_SEM_CONTEUDO:
+                    continue
+                if _peso(chave) == 0:
+                    chave = tuple(_tokens_acentuados(str(valor)))
+                    self._valores_acentuados.setdefault(chave, []).append((coluna, str(valor)))
+                else:
+                    self._valores_recorte.setdefault(chave, []).append((coluna, str(valor)))
+
+        self._vocabulario = sorted(
+            {t for chave in self._ngramas_indicador for t in chave}
+            | {t for chave in self._valores_recorte for t in chave}
+        )
+        self._max_recorte = max(
+            (len(c) for c in list(self._valores_recorte) + list(self._valores_acentuados)), default=0
+        )
+
+    #######################
+    # Etapas de reconhecimento
+
+    def _corrigir(self, tokens):
+        """Corrige erros de digitação contra o vocabulário do catálogo."""
+        conhecidas = (set(self._vocabulario) | STOPWORDS | NEUTRAS | AGREGACOES | set(DIMENSOES_CUBO)
+                      | SERIE_HISTORICA)
+        corrigidos, confianca = [], 1.0
+        for token in tokens:
+            if len(token) >= 5 and not token.isdigit() and token not in conhecidas:
+                parecidas = difflib.get_close_matches(token, self._vocabulario, n=1, cutoff=0.85)
+                if parecidas:
+                    token = parecidas[0]
+                    confianca *= 0.9
+            corrigidos.append(token)
+        return corrigidos, confianca
+
+    def _indicador(self, tokens):
+        """Trecho de nome de indicador mais relevante contido na pergunta."""
+        melhor, melhor_peso = None, 0.0
+        for i in range(len(tokens)):
+            for j in range(len(tokens), i, -1):
+                chave = tuple(tokens[i:j])
+                if chave not in self._ngramas_indicador:
+                    continue
+                # Remove stopwords das pontas do trecho
+                inicio, fim = i, j
+                while inicio < fim and tokens[inicio] in STOPWORDS:
+                    inicio += 1
+                while fim > inicio and tokens[fim - 1] in STOPWORDS:
+                    fim -= 1
+                peso = _peso(tokens[inicio:fim])
+                if peso > melhor_peso and tuple(tokens[inicio:fim]) in self._ngramas_indicador:
+                    melhor, melhor_peso = (inicio, fim), peso
+                break
+        if melhor is None or melhor_peso < 1:
+            return None
+        inicio, fim = melhor
+        return self._ngramas_indicador[tuple(tokens[inicio:fim])], set(range(inicio, fim))
+
+    def _recortes(self, tokens, acentuados, usados):
+        """Valores de recorte presentes na pergunta, do mais longo ao mais curto."""
+        if len(acentuados) != len(tokens):
+            acentuados = tokens
+        encontrados = []
+        for tamanho in range(min(self._max_recorte, len(tokens)), 0, -1):
+            for i in range(len(tokens) - tamanho + 1):
+                posicoes = set(range(i, i + tamanho))
+                if posicoes & usados:
+                    continue
+                candidatos = self._valores_recorte.get(tuple(tokens[i:i + tamanho])) or \
+                    self._valores_acentuados.get(tuple(acentuados[i:i + tamanho]))
+                if not candidatos:
+                    continue
+                pistas = {PISTAS_RECORTE[t] for t in tokens if t in PISTAS_RECORTE}
+                candidatos = sorted(
+                    candidatos,
+                    key=lambda c: (c[0] not in pistas, COLUNAS_RECORTE.index(c[0])),
+                )
+                if candidatos[0] not in encontrados:
+                    encontrados.append(candidatos[0])
+                usados |= posicoes
+        return encontrados
+
+    def _agregacao(self, tokens, usados):
+        """Para perguntas agregadas, devolve (recorte do cubo ou None, posições usadas); senão None.
+
+        A pergunta é agregada se pede média, mediana ou comparação, ou se
+        agrupa por um recorte ("por estado", "entre as regiões").
+        """
+        agregada = any(t in AGREGACOES for i, t in enumerate(tokens) if i not in usados)
+        dimensao, posicoes = None, set()
+        for i, token in enumerate(tokens):
+            if i in usados or token not in DIMENSOES_CUBO:
+                continue
+            # "região imediata" e "região intermediária" não estão no cubo
+            if token.startswith("regi") and tokens[i + 1:i + 2] in (["imediata"], ["intermediaria"]):
+                continue
+            anterior = i - 1
+            while anterior >= 0 and (tokens[anterior] in STOPWORDS - {"por"} or tokens[anterior] == "faixa"):
+                anterior -= 1
+            agrupada = anterior >= 0 and tokens[anterior] in ("por", "entre")
+            if agrupada or (agregada and DIMENSOES_CUBO[token] in DIMENSOES_BINARIAS):
+                dimensao = DIMENSOES_CUBO[token]
+                posicoes = set(range(max(anterior, 0), i + 1))
+                break
+        if not agregada and dimensao is None:
+            return None
+        return dimensao, posicoes
+
+    def entidades(self, pergunta):
+        """Indicador, valores de recorte e palavras de ordenação citados na pergunta.
+
+        O cache de SQL só reaproveita uma pergunta parecida quando as entidades
+        coincidem ("Mato Grosso" e "Mato Grosso do Sul", "maior" e "menor").
+        """
+        tokens, _ = self._corrigir(_tokens(pergunta))
+        encontradas, usados = set(), set()
+        indicador = self._indicador(tokens)
+        if indicador is not None:
+            trecho, usados = indicador
+            encontradas.add(("indicador", trecho))
+        encontradas |= set(self._recortes(tokens, _tokens_acentuados(pergunta), set(usados)))
+        encontradas |= {("ordem", ORDENACAO[t]) for t in tokens if t in ORDENACAO}
+        if any(t in SERIE_HISTORICA for i, t in enumerate(tokens) if i not in usados):
+            encontradas.add(("serie", True))
+        return frozenset(encontradas)
+
+    #######################
+    # Planejamento
+
+    def planejar(self, pergunta):
+        """Devolve (sql, confiança); sql é None quando a pergunta não é reconhecida."""
+        tokens, confianca = self._corrigir(_tokens(pergunta))
+
+        anos = sorted({t for t in tokens if re.fullmatch(r"(19|20)\d{2}", t)})
+        if len(anos) > 1:
+            return None, 0.0
+
+        indicador = self._indicador(tokens)
+        if indicador is None:
+            return None, 0.0
+        trecho, usados = indicador
+
+        # "Evolução de ..." pede todos os anos; com ano ou agregada, fica com a LLM
+        serie = any(t in SERIE_HISTORICA for i, t in enumerate(tokens) if i not in usados)
+        agregacao = self._agregacao(tokens, set(usados)) if self.cubo else None
+        if serie and (anos or agregacao is not None):
+            return None, 0.0
+        if agregacao is not None:
+            return self._planejar_agregada(pergunta, tokens, trecho, usados, anos, agregacao, confianca)
+
+        recortes = self._recortes(tokens, _tokens_acentuados(pergunta), set(usados))
+        fronteira = "fronteira" in tokens and "faixa" in tokens
+
+        # Palavras de conteúdo que não foram explicadas indicam filtros não reconhecidos
+        explicadas = set(_tokens(trecho)) | set(anos) | {"faixa", "fronteira"} | SERIE_HISTORICA
+        for _, valor in recortes:
+            explicadas |= set(_tokens(valor))
+        sobras = [
+            t for t in tokens
+            if t not in explicadas and t not in STOPWORDS and t not in NEUTRAS
+            and t not in GENERICAS
+        ]
+        # Pistas de recorte ("região imediata de ...") sem valor reconhecido também contam
+        colunas = {coluna for coluna, _ in recortes}
+        sobras += [
+            t for t in tokens
+            if t in PISTAS_RECORTE and t in NEUTRAS and t != "municipio"
+            and PISTAS_RECORTE[t] not in colunas
+        ]
+        confianca -= 0.25 * len(sobras)
+        if len({coluna for coluna, _ in recortes}) > 2:
+            confianca -= 0.25
+
+        if confianca < self.limiar:
+            return None, max(confianca, 0.0)
+        sql = self._sql(trecho, recortes, anos[0] if anos else None, "mapa" in tokens, fronteira, serie)
+        return sql, confianca
+
+    def _planejar_agregada(self, pergunta, tokens, trecho, usados, anos, agregacao, confianca):
+        """Pergunta agregada: um recorte do cubo, agrupado ou filtrado por um valor."""
+        dimensao, posicoes = agregacao
+        recortes = self._recortes(tokens, _tokens_acentuados(pergunta), set(usados) | posicoes)
+        # Agrupar e filtrar ao mesmo tempo, ou filtrar fora dos recortes do cubo, fica para a LLM
+        if len(recortes) > 1 or (recortes and (dimensao or recortes[0][0] not in RECORTES_CUBO)):
+            return None, 0.0
+
+        explicadas = set(_tokens(trecho)) | set(anos) | AGREGACOES | set(DIMENSOES_CUBO) | NEUTRAS_AGREGACAO
+        for _, valor in recortes:
+            explicadas |= set(_tokens(valor))
+        sobras = [
+            t for t in tokens
+            if t not in explicadas and t not in STOPWORDS and t not in NEUTRAS and t not in GENERICAS
+        ]
+        confianca -= 0.25 * len(sobras)
+        if confianca < self.limiar:
+            return None, max(confianca, 0.0)
+
+        ano = anos[0] if anos else None
+        if recortes:
+            coluna, valor = recortes[0]
+            return sql_consulta(trecho, coluna, valor, ano), confianca
+        return sql_consulta(trecho, dimensao or "brasil", None, ano), confianca
+
+    def _sql(self, trecho, recortes, ano, mapa, fronteira, serie=False):
+        # Valores do mesmo recorte ("na Bahia e em Sergipe") somam-se num único IN
+        por_coluna = {}
+        for coluna, valor in recortes:
+            por_coluna.setdefault(coluna, []).append(valor)
+
+        colunas = ["r.codigo_ibge", "r.município", "r.estado"]
+        colunas += [f"r.{coluna}" for coluna in por_coluna if f"r.{coluna}" not in colunas]
+        colunas += ["v.value", "v.ano", "v.data_name"]
+        if mapa:
+            colunas += ["r.latitude", "r.longitude"]
+
+        filtros = []
+        for coluna, valores in por_coluna.items():
+            if len(valores) == 1:
+                filtros.append(f"r.{coluna} = '{_aspas(valores[0])}'")
+            else:
+                filtros.append(f"r.{coluna} IN (" + ", ".join(f"'{_aspas(v)}'" for v in valores) + ")")
+        if fronteira:
+            filtros.append("r.faixa_de_fronteira = 1")
+        filtros.append(
+            f"v.indicador_id IN (SELECT indicador_id FROM indicadores WHERE data_name LIKE '%{_aspas(trecho)}%')"
+        )
+        if ano:
+            filtros.append(f"v.ano = {ano}")
+        # Sem ano, usa a tabela materializada com o valor mais recente de cada município
+        tabela = "valoresmeta" if ano or serie else "valoresmeta_latest"
+
+        sql = (
+            "SELECT\n    " + ",\n    ".join(colunas) + "\n"
+            f"FROM\n    {tabela} AS v\n"
+            "LEFT JOIN\n    recortes_geograficos AS r ON r.codigo_ibge = v.geoloc_id\n"
+            "WHERE\n    " + "\n    AND ".join(filtros)
+        )
+        if serie:
+            sql += "\nORDER BY\n    r.codigo_ibge, v.ano"
+        return sql + ";"
@@ -0,0 +1,70 @@
+"""Prepara `dados_reduzido.db` para consultas rápidas (etapa offline).
+
+Acrescenta ao banco:
+- `indicadores(indicador_id, data_name)`: dicionário dos nomes de indicadores;
+- colunas `ano` (INTEGER) e `indicador_id` em `valoresmeta`, com as linhas
+  ordenadas por (indicador_id, ano, geoloc_id) para aproveitar os zone maps;
+- `valoresmeta_latest`: apenas o valor mais recente de cada indicador por município.
+
+Pode ser executado novamente após cada carga de dados. O aplicativo abre o
+banco em modo somente leitura, então deve estar parado durante a preparação.
+
+Uso:
+    python preparar_banco.py [--banco data/dados_reduzido.db]
+"""
+import argparse
+import time
+
+import duckdb
+
+from banco import CAMINHO_BANCO
+
+# Colunas originais de valoresmeta, na ordem do schema
+COLUNAS_VALORESMETA = (
+    "mdata_id", "geoloc_id", "local_id", "refdate", "value", "orig_name", "data_name", "local_name",
+)
+
+
+def preparar_banco(conn):
+    """Cria o dicionário de indicadores, as colunas derivadas e a tabela de valores mais recentes."""
+    colunas = ", ".join(COLUNAS_VALORESMETA)
+    conn.execute("BEGIN TRANSACTION")
+    conn.execute(
+        """CREATE OR REPLACE TABLE indicadores AS
+           SELECT CAST(row_number() OVER (ORDER BY data_name) AS INTEGER) AS indicador_id, data_name
+           FROM (SELECT DISTINCT data_name FROM valoresmeta WHERE data_name IS NOT NULL)"""
+    )
+    conn.execute(
+        f"""CREATE OR REPLACE TABLE valoresmeta_ordenada AS
+            SELECT {", ".join("v." + c for c in COLUNAS_VALORESMETA)},
+                   CAST(year(v.refdate) AS INTEGER) AS ano,
+                   i.indicador_id
+            FROM (SELECT {colunas} FROM valoresmeta) AS v
+            LEFT JOIN indicadores AS i ON i.data_name = v.data_name
+            ORDER BY i.indicador_id, ano, v.geoloc_id"""
+    )
+    conn.execute("DROP TABLE valoresmeta")
+    conn.execute("ALTER TABLE valoresmeta_ordenada RENAME TO valoresmeta")
+    # Mantém empates em refdate, como a subconsulta MAX(refdate) que esta tabela substitui
+    conn.execute(
+        """CREATE OR REPLACE TABLE valoresmeta_latest AS
+           SELECT *
+           FROM valoresmeta
+           QUALIFY refdate = MAX(refdate) OVER (PARTITION BY geoloc_id, data_name)
+           ORDER BY indicador_id, geoloc_id"""
+    )
+    conn.execute("COMMIT")
+    conn.execute("CHECKPOINT")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prepara o banco DuckDB para consultas rápidas.")
+    parser.add_argument("--banco", default=CAMINHO_BANCO)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    conn = duckdb.connect(args.banco)
+    preparar_banco(conn)
+    linhas = conn.execute("SELECT COUNT(*) FROM valoresmeta_latest").fetchone()[0]
+    conn.close()
+    print(f"Banco preparado em {time.perf_counter() - inicio:.1f} s ({linhas} valores mais recentes)")
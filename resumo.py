@@ -0,0 +1,302 @@
+"""Resumo estatístico do resultado da consulta para a análise por IA.
+
+Em vez de enviar todas as linhas à LLM, resultados grandes são condensados em
+um resumo estruturado: estatísticas gerais e quantis, médias por recorte
+geográfico, variação entre anos, maiores e menores municípios e valores
+atípicos. Resultados pequenos continuam sendo enviados linha a linha.
+
+Com o cubo de `cubo.py`, o payload traz também as referências nacionais e por
+recorte do mesmo indicador e ano, lidas do cubo em vez de calculadas.
+"""
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+
+# Recortes agregados no resumo, quando presentes no resultado ou na tabela de recortes
+COLUNAS_RECORTE = (
+    "estado",
+    "região",
+    "tipologia",
+    "participacao_semiarido",
+    "participacao_sudene",
+    "participacao_amazonia_legal",
+    "faixa_de_fronteira",
+)
+
+# Identificação das linhas dos resultados do cubo (`cubo.sql_consulta`): o recorte e o seu valor
+COLUNAS_CUBO = ("recorte", "valor")
+
+# Colunas do resultado usadas no resumo
+COLUNAS_RESUMO = (
+    ("codigo_ibge", "município", "estado", "value", "ano", "refdate", "data_name") + COLUNAS_RECORTE + COLUNAS_CUBO
+)
+
+# Limites configuráveis por variáveis de ambiente: até quantas linhas o resultado vai
+# completo à LLM e o orçamento aproximado de tokens do payload
+LIMITE_LINHAS_COMPLETAS = int(os.environ.get("PNDR_LIMITE_LINHAS_COMPLETAS", "200"))
+ORCAMENTO_TOKENS = int(os.environ.get("PNDR_ORCAMENTO_TOKENS", "6000"))
+# Máximo de indicadores com referências do cubo no payload
+LIMITE_REFERENCIAS = 5
+QUANTIS = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+
+def estimar_tokens(texto):
+    """Estimativa grosseira (4 caracteres por token), suficiente para o orçamento."""
+    return len(texto) // 4
+
+
+def _json(dados):
+    return json.dumps(dados, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _arredondar(valor):
+    return None if pd.isna(valor) else round(float(valor), 4)
+
+
+def _estatisticas(valores):
+    descricao = {"n": int(valores.count()), "media": _arredondar(valores.mean())}
+    if descricao["n"]:
+        descricao["desvio"] = _arredondar(valores.std())
+        descricao["min"] = _arredondar(valores.min())
+        descricao["max"] = _arredondar(valores.max())
+        for q, v in valores.quantile(QUANTIS).items():
+            descricao[f"p{int(q * 100)}"] = _arredondar(v)
+    return descricao
+
+
+def _coluna_ano(df):
+    if "ano" in df.columns:
+        return pd.to_numeric(df["ano"], errors="coerce")
+    if "refdate" in df.columns:
+        return pd.to_datetime(df["refdate"], errors="coerce").dt.year
+    return None
+
+
+def _municipios(df, n):
+    # Nos resultados do cubo, cada linha é um valor de recorte (UF, região...), não um município
+    colunas = [c for c in ("município", "estado") + COLUNAS_CUBO + ("value",) if c in df.columns]
+    return [
+        {k: (_arredondar(v) if k == "value" else v) for k, v in linha.items()}
+        for linha in df[colunas].to_dict(orient="records")[:n]
+    ]
+
+
+def _resumir_indicador(df, top_n):
+    resumo = {"geral": _estatisticas(df["value"])}
+
+    if "_ano" in df.columns and df["_ano"].notna().any():
+        por_ano = df.groupby("_ano")["value"].agg(["count", "mean", "median"])
+        resumo["por_ano"] = {
+            int(ano): {"n": int(l["count"]), "media": _arredondar(l["mean"]), "mediana": _arredondar(l["median"])}
+            for ano, l in por_ano.iterrows()
+        }
+        variacao = por_ano[["mean", "median"]].diff().dropna()
+        if not variacao.empty:
+            resumo["variacao_anual"] = {
+                int(ano): {"media": _arredondar(l["mean"]), "mediana": _arredondar(l["median"])}
+                for ano, l in variacao.iterrows()
+            }
+        # Os demais blocos usam apenas o ano mais recente
+        ultimo = df["_ano"].max()
+        resumo["ano_referencia"] = int(ultimo)
+        recente = df[df["_ano"] == ultimo]
+
+        if "codigo_ibge" in df.columns and len(por_ano) > 1:
+            anterior = df.loc[df["_ano"] < ultimo, "_ano"].max()
+            pares = df[df["_ano"].isin([anterior, ultimo])].pivot_table(
+                index="codigo_ibge", columns="_ano", values="value", aggfunc="mean"
+            ).dropna()
+            if not pares.empty:
+                delta = (pares[ultimo] - pares[anterior]).sort_values()
+                nomes = recente.drop_duplicates("codigo_ibge").set_index("codigo_ibge")
+                def movimentos(serie):
+                    return [
+                        {"município": nomes["município"].get(c) if "município" in nomes else c,
+                         "variacao": _arredondar(v)}
+                        for c, v in serie.items()
+                    ]
+                resumo["maiores_altas"] = movimentos(delta.tail(top_n)[::-1])
+                resumo["maiores_quedas"] = movimentos(delta.head(top_n))
+    else:
+        recente = df
+
+    ordenado = recente.dropna(subset=["value"]).sort_values("value")
+    resumo["maiores"] = _municipios(ordenado[::-1], top_n)
+    resumo["menores"] = _municipios(ordenado, top_n)
+
+    q1, q3 = ordenado["value"].quantile([0.25, 0.75])
+    amplitude = q3 - q1
+    atipicos = ordenado[(ordenado["value"] < q1 - 3 * amplitude) | (ordenado["value"] > q3 + 3 * amplitude)]
+    resumo["atipicos"] = {"n": int(len(atipicos)), "exemplos": _municipios(atipicos, top_n)}
+
+    por_recorte = {}
+    for coluna in COLUNAS_RECORTE:
+        if coluna in recente.columns and recente[coluna].nunique() > 1:
+            grupos = recente.groupby(coluna)["value"].agg(["count", "mean", "median"])
+            por_recorte[coluna] = {
+                str(valor): {"n": int(l["count"]), "media": _arredondar(l["mean"]), "mediana": _arredondar(l["median"])}
+                for valor, l in grupos.iterrows()
+            }
+    if por_recorte:
+        resumo["por_recorte"] = por_recorte
+    return resumo
+
+
+def resumir_dados(df, recortes=None, top_n=10):
+    """Resumo estruturado de um resultado com coluna `value`.
+
+    `recortes` (opcional) é a tabela de recortes geográficos indexada por
+    `codigo_ibge`; dela vêm os recortes que não estão no resultado.
+    """
+    df = df.copy()
+    df["value"] = pd.to_numeric(df["value"], errors="coerce")
+    ano = _coluna_ano(df)
+    if ano is not None:
+        df["_ano"] = ano
+    if recortes is not None and "codigo_ibge" in df.columns:
+        faltantes = [c for c in recortes.columns if c not in df.columns]
+        if faltantes:
+            df = df.join(recortes[faltantes], on="codigo_ibge")
+
+    resumo = {"linhas": int(len(df)), "indicadores": {}}
+    if "data_name" in df.columns:
+        for nome, grupo in df.groupby("data_name"):
+            resumo["indicadores"][nome] = _resumir_indicador(grupo, top_n)
+    else:
+        resumo["indicadores"]["value"] = _resumir_indicador(df, top_n)
+    return resumo
+
+
+def resumir_colunas(df, amostra=20, top_n=10):
+    """Resumo de um resultado sem coluna `value`: amostra de linhas e perfil de cada coluna.
+
+    Colunas numéricas trazem as estatísticas gerais; as demais, o número de
+    valores distintos e os `top_n` mais frequentes.
+    """
+    colunas = {}
+    for coluna in df.columns:
+        valores = df[coluna]
+        if pd.api.types.is_numeric_dtype(valores) and not pd.api.types.is_bool_dtype(valores):
+            colunas[str(coluna)] = _estatisticas(valores)
+        else:
+            valores = valores.astype(str).where(valores.notna())
+            frequentes = valores.value_counts().head(top_n)
+            colunas[str(coluna)] = {
+                "n": int(valores.count()),
+                "distintos": int(valores.nunique()),
+                "frequentes": {str(v): int(c) for v, c in frequentes.items()},
+            }
+    return {
+        "linhas": int(len(df)),
+        "colunas": colunas,
+        "amostra": json.loads(df.head(amostra).to_json(orient="records", force_ascii=False)),
+    }
+
+
+def _payload_colunas(df, orcamento_tokens):
+    # Reduz a amostra e as listas de frequentes até o resumo caber no orçamento
+    amostra = top_n = 20
+    while True:
+        resumo = resumir_colunas(df, amostra=amostra, top_n=top_n)
+        texto = _json(resumo)
+        if estimar_tokens(texto) <= orcamento_tokens or amostra == 0:
+            break
+        amostra, top_n = amostra // 2, max(1, top_n // 2)
+    # Último recurso: mantém o perfil apenas das primeiras colunas que couberem
+    while estimar_tokens(texto) > orcamento_tokens and len(resumo["colunas"]) > 1:
+        nomes = list(resumo["colunas"])
+        resumo["colunas"] = {n: resumo["colunas"][n] for n in nomes[: len(nomes) // 2]}
+        resumo["colunas_omitidas"] = len(df.columns) - len(resumo["colunas"])
+        texto = _json(resumo)
+    return (
+        f"Os dados abaixo são um resumo de {len(df)} linhas (perfil de cada coluna e "
+        f"uma amostra das primeiras linhas). Analise o seguinte resumo {texto}"
+    )
+
+
+def referencias_cubo(df, cubo, limite=LIMITE_REFERENCIAS):
+    """{indicador: referências do cubo} para o ano mais recente de cada indicador do resultado."""
+    # Resultados que já vêm do cubo não precisam de referência
+    if cubo is None or "data_name" not in df.columns or "recorte" in df.columns:
+        return {}
+    ano = _coluna_ano(df)
+    if ano is None:
+        return {}
+    referencias = {}
+    for nome, anos in ano.groupby(df["data_name"]).max().dropna().head(limite).items():
+        encontradas = cubo.referencias(nome, int(anos))
+        if encontradas:
+            referencias[nome] = {"ano": int(anos), **encontradas}
+    return referencias
+
+
+def preparar_payload(df, recortes=None, orcamento_tokens=ORCAMENTO_TOKENS,
+                     limite_linhas=LIMITE_LINHAS_COMPLETAS, cubo=None):
+    """Texto enviado à LLM: as linhas completas, se couberem, ou o resumo estatístico.
+
+    Aceita DataFrame ou tabela Arrow; de tabelas grandes, só as colunas do
+    resumo são convertidas para pandas. Com `cubo` (`cubo.CuboRecortes`), os
+    agregados nacionais e por recorte entram como referência.
+    """
+    if isinstance(df, pa.Table):
+        # Sem `value` não há resumo estatístico, e todas as colunas entram no perfil
+        if df.num_rows > limite_linhas and "value" in df.column_names:
+            df = df.select([c for c in df.column_names if c in COLUNAS_RESUMO])
+        df = df.to_pandas()
+    referencias = referencias_cubo(df, cubo)
+    if len(df) <= limite_linhas:
+        completo = df.to_json(orient="records", force_ascii=False)
+        if referencias:
+            texto = _json(referencias)
+            if estimar_tokens(completo) + estimar_tokens(texto) <= orcamento_tokens:
+                return (f"Analise os seguintes dados {completo}\n"
+                        f"Compare-os com as médias e medianas nacionais e por recorte geográfico "
+                        f"do mesmo indicador e ano {texto}")
+        if estimar_tokens(completo) <= orcamento_tokens:
+            return f"Analise os seguintes dados {completo}"
+    if "value" not in df.columns:
+        return _payload_colunas(df, orcamento_tokens)
+
+    # Reduz os rankings até o resumo caber no orçamento
+    top_n = 10
+    while True:
+        resumo = resumir_dados(df, recortes, top_n=top_n)
+        for nome, referencia in referencias.items():
+            if nome in resumo["indicadores"]:
+                resumo["indicadores"][nome]["referencias"] = referencia
+        texto = _json(resumo)
+        if estimar_tokens(texto) <= orcamento_tokens or top_n == 1:
+            break
+        top_n = max(1, top_n // 2)
+
+    if estimar_tokens(texto) > orcamento_tokens:
+        # Último recurso: descarta os recortes com mais categorias e, se preciso, as referências
+        for chave in ("por_recorte", "referencias"):
+            for indicador in resumo["indicadores"].values():
+                indicador.pop(chave, None)
+            texto = _json(resumo)
+            if estimar_tokens(texto) <= orcamento_tokens:
+                break
+
+    # Se ainda não couber, mantém só os indicadores com mais linhas
+    nomes = sorted(resumo["indicadores"], key=lambda n: -resumo["indicadores"][n]["geral"]["n"])
+    while estimar_tokens(texto) > orcamento_tokens and len(nomes) > 1:
+        nomes = nomes[: len(nomes) // 2]
+        resumo["indicadores"] = {n: resumo["indicadores"][n] for n in nomes}
+        resumo["indicadores_omitidos"] = df["data_name"].nunique() - len(nomes)
+        texto = _json(resumo)
+
+    if "recorte" in df.columns:
+        conteudo = "agregados do cubo por recorte geográfico e ano"
+    else:
+        conteudo = "valores por município, recortes geográficos e anos"
+    if referencias:
+        conteudo += "; em referencias, os agregados nacionais e por recorte do mesmo indicador e ano"
+    if "indicadores_omitidos" in resumo:
+        conteudo += f"; {resumo['indicadores_omitidos']} indicadores com menos dados foram omitidos"
+    return (
+        f"Os dados abaixo são um resumo estatístico de {len(df)} linhas "
+        f"({conteudo}). Analise o seguinte resumo {texto}"
+    )